@@ -2,5 +2,6 @@
 from .version import *
 from . import config_tb
 from . import config_cascade
+from . import blobcodecs
 from . import rpcs
 from . import main
\ No newline at end of file
@@ -36,17 +36,57 @@ celery_instance = sw.make_celery(config=config) # Create the Celery instance for
 
 
 @async_task
-def run_tb_optimization(project_id, cache_id, optim_name=None, maxtime=None):
+def run_tb_optimization(project_id, cache_id, optim_name=None, maxtime=None, starts=None, warm_start=False):
     print('Running optimization...')
-    sc.printvars(locals(), ['project_id', 'optim_name', 'maxtime'], color='blue')
+    sc.printvars(locals(), ['project_id', 'optim_name', 'maxtime', 'starts', 'warm_start'], color='blue')
     datastore = rpcs.find_datastore(config=config)
     origproj = rpcs.load_project(project_id)
-    results = rpcs.run_json_optimization(origproj,optim_name, maxtime=float(maxtime))
-    newproj = datastore.loadblob(uid=project_id, objtype='project', die=True)
+    results = rpcs.run_json_optimization(origproj,optim_name, maxtime=float(maxtime), starts=int(starts) if starts else None, cache_id=cache_id, warm_start=warm_start) # Resumes from any checkpoints under the cache ID
+    newproj = rpcs.load_project(project_id, die=True) # Reload, since the project may have changed while optimizing
     result_key = rpcs.cache_result(newproj, results, cache_id)
+    rpcs.save_optimized_allocation(project_id, optim_name, results[1].optim_summary['allocation'])
+    return {'result_key':result_key, 'summary':results[1].optim_summary}
+
+
+@async_task
+def run_tb_budget_sweep(project_id, cache_id, optim_name=None, budget_factors=None, maxtime=None):
+    print('Running budget sweep...')
+    sc.printvars(locals(), ['project_id', 'optim_name', 'budget_factors', 'maxtime'], color='blue')
+    datastore = rpcs.find_datastore(config=config)
+    origproj = rpcs.load_project(project_id)
+    frontier = rpcs.sweep_budget(origproj, optim_name, budget_factors, maxtime=float(maxtime) if maxtime else None)
+    newproj = rpcs.load_project(project_id, die=True) # Reload, since the project may have changed while optimizing
+    result_key = rpcs.cache_result(newproj, frontier, cache_id)
     return result_key
 
 
+@async_task
+def run_tb_calibration(project_id, cache_id, parsetname=-1, max_time=20):
+    print('Running automatic calibration...')
+    sc.printvars(locals(), ['project_id', 'parsetname', 'max_time'], color='blue')
+    datastore = rpcs.find_datastore(config=config)
+    proj = rpcs.load_project(project_id, die=True)
+    result = rpcs.run_calibration(proj, parsetname=parsetname, max_time=float(max_time), tool='tb', progress=rpcs.report_progress)
+    parset = proj.parsets[parsetname]
+    def edit(newproj): # Only the calibrated parset is copied, since the project may have changed while calibrating
+        newproj.parsets[parset.name] = parset
+    rpcs.edit_project(project_id, edit)
+    newproj = rpcs.load_project(project_id, die=True)
+    result_key = rpcs.cache_result(newproj, result, cache_id)
+    return result_key
+
+
+
+@celery_instance.task
+def collect_garbage():
+    ''' Periodic task to delete results, figures and task records that nothing refers to -- see rpcs.admin_collect_garbage() '''
+    rpcs.find_datastore(config=config)
+    output = rpcs.admin_collect_garbage()
+    return output['counts']
+
+if float(config.GC_INTERVAL): # Needs the scheduler to be running, i.e. bin/beat_tb.py
+    celery_instance.conf.beat_schedule = {'collect_garbage': {'task':collect_garbage.name, 'schedule':3600*float(config.GC_INTERVAL)}}
+
 
 # Add the asynchronous task functions in this module to the tasks.py module so run_task() can call them.
 sw.add_task_funcs(task_func_dict)
\ No newline at end of file
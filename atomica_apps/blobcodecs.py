@@ -0,0 +1,116 @@
+'''
+Compression codecs for the bytes stored in the datastore.
+
+Everything written by the app is prefixed with a short header naming the codec, so
+the codec can be changed in the config module without breaking anything already
+stored. Data without a header is assumed to be gzipped, which is what sc.dumpstr()
+and earlier versions of the app produced.
+
+zstd and lz4 are optional: they need the zstandard and lz4 packages respectively.
+
+Last update: 2026oct18
+'''
+
+import gzip
+import pickle
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+MAGIC = b'ATBLOB:' # Start of the header -- the full header is e.g. b'ATBLOB:zstd:'
+DEFAULT_CODEC = 'gzip'
+
+
+def _zstd_compress(data, level):
+    if level is None: level = 3
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+def _lz4_compress(data, level):
+    if level is None: level = 0
+    return lz4.frame.compress(data, compression_level=level)
+
+def _lz4_decompress(data):
+    return lz4.frame.decompress(data)
+
+def _gzip_compress(data, level):
+    if level is None: level = 6
+    return gzip.compress(data, compresslevel=level)
+
+
+# Codec name: (compress function taking data and level, decompress function, whether it's available)
+CODECS = {
+    'none': (lambda data, level: data, lambda data: data, True),
+    'gzip': (_gzip_compress, gzip.decompress, True),
+    'zstd': (_zstd_compress, _zstd_decompress, zstandard is not None),
+    'lz4':  (_lz4_compress, _lz4_decompress, lz4 is not None),
+}
+
+
+def available_codecs():
+    ''' Return the names of the codecs that can be used in this environment '''
+    output = [name for name,codec in CODECS.items() if codec[2]]
+    return output
+
+
+def get_codec(name):
+    ''' Return the compress and decompress functions of a codec, raising an exception if it can't be used '''
+    if name not in CODECS:
+        errormsg = 'Codec "%s" not recognized; choices are: %s' % (name, ', '.join(CODECS.keys()))
+        raise Exception(errormsg)
+    compress, decompress, available = CODECS[name]
+    if not available:
+        errormsg = 'Codec "%s" is not available since its package is not installed' % name
+        raise Exception(errormsg)
+    return compress, decompress
+
+
+def compress(data, codec=None, level=None):
+    ''' Compress bytes with the given codec, and prefix them with a header naming it '''
+    if codec is None: codec = DEFAULT_CODEC
+    func = get_codec(codec)[0]
+    output = MAGIC + codec.encode() + b':' + func(data, level)
+    return output
+
+
+def parse_header(raw):
+    ''' Return the codec name and the payload of stored bytes, or None as the codec if there's no header '''
+    if raw[:len(MAGIC)] == MAGIC:
+        end = raw.index(b':', len(MAGIC))
+        codec = raw[len(MAGIC):end].decode()
+        payload = raw[end+1:]
+        return codec, payload
+    else:
+        return None, raw
+
+
+def decompress(raw):
+    ''' Decompress bytes stored by compress(), or legacy gzipped bytes without a header '''
+    codec, payload = parse_header(raw)
+    if codec is None:
+        output = gzip.decompress(payload)
+    else:
+        output = get_codec(codec)[1](payload)
+    return output
+
+
+def dumps(obj, codec=None, level=None):
+    ''' Pickle and compress an object '''
+    output = compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), codec=codec, level=level)
+    return output
+
+
+def loads(raw):
+    ''' Decompress and unpickle an object stored by dumps() '''
+    output = pickle.loads(decompress(raw))
+    return output
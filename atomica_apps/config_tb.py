@@ -41,6 +41,81 @@ if datastore is not None:
 else:
     DATASTORE_URL = REDIS_URL
 
+# Number of deserialized projects each web/worker process keeps in memory.
+# Cached projects are checked against a modification token on every load, so
+# this is safe with multiple processes. Set to 0 to disable the cache.
+PROJECT_CACHE_SIZE = int(os.getenv('PROJECT_CACHE_SIZE', 10))
+
+# Total size, in MB, of the project components (frameworks, databooks, parsets,
+# etc.) each web/worker process keeps in memory. Components are stored under
+# their hash, so they never go out of date. Set to 0 to disable the cache.
+COMPONENT_CACHE_SIZE = float(os.getenv('COMPONENT_CACHE_SIZE', 200))
+
+# Hours a project component is kept after no project refers to it any more, so
+# that requests that loaded a project just before it was saved can still load
+# the components they need.
+COMPONENT_EXPIRY = float(os.getenv('COMPONENT_EXPIRY', 1))
+
+# Number of processes used to run the scenarios of a project in parallel. Set
+# to 1 to run them one after another in the web process.
+SCENARIO_PROCESSES = int(os.getenv('SCENARIO_PROCESSES', 4))
+
+# Whether budget and coverage scenarios that share a parset and program start
+# year simulate the years before it once, and branch off from the model state in
+# that year, rather than each simulating every year.
+SCENARIO_BRANCHING = os.getenv('SCENARIO_BRANCHING', '1') == '1'
+
+# Calibration sessions keep a project in memory in the web server process while
+# its y-factors are being edited, and save it when they're closed or after this
+# many minutes without being used.
+CALIBRATION_SESSION_TIMEOUT = float(os.getenv('CALIBRATION_SESSION_TIMEOUT', 30))
+
+# Number of starts of each optimization, from different initial allocations (an
+# optimization JSON can override this with 'starts'), and the number of processes
+# the Celery worker runs them in. Set OPTIM_PROCESSES to 1 to run them one after
+# another in the worker process.
+OPTIM_STARTS = int(os.getenv('OPTIM_STARTS', 1))
+OPTIM_PROCESSES = int(os.getenv('OPTIM_PROCESSES', 4))
+
+# Optimization tasks save their progress every OPTIM_CHECKPOINT_INTERVAL seconds
+# and every OPTIM_CHECKPOINT_EVALUATIONS objective evaluations (0 to disable either),
+# so that relaunching a task that was interrupted, e.g. by a worker restart, resumes
+# where it left off.
+OPTIM_CHECKPOINT_INTERVAL = float(os.getenv('OPTIM_CHECKPOINT_INTERVAL', 60))
+OPTIM_CHECKPOINT_EVALUATIONS = int(os.getenv('OPTIM_CHECKPOINT_EVALUATIONS', 0))
+
+# Objective values are memoized during an optimization on the allocation rounded
+# to this many dollars, so allocations that are revisited (e.g. at the spending
+# limits) aren't simulated again. Set to 0 to disable.
+OPTIM_MEMO_TOLERANCE = float(os.getenv('OPTIM_MEMO_TOLERANCE', 1))
+
+# Number of times an edit that doesn't depend on the rest of the project (e.g.
+# renaming it or adding a result) is retried if another request saves the project
+# at the same time. Other edits fail with a ProjectConflictError instead.
+PROJECT_SAVE_RETRIES = int(os.getenv('PROJECT_SAVE_RETRIES', 3))
+
+# Garbage collection of keys nothing refers to any more, e.g. results from abandoned
+# sessions: they're deleted once they haven't been used for this many hours. The
+# Celery workers run the collector every GC_INTERVAL hours (0 to disable) if the
+# scheduler, bin/beat_tb.py, is running, and it can also be run with
+# bin/collect_garbage.py.
+GC_TTLS = {'result':24, 'figures':7*24, 'task':7*24}
+GC_INTERVAL = float(os.getenv('GC_INTERVAL', 24))
+
+# Simulation results are cached under a hash of everything that went into them, so
+# running the same simulation again returns straight away. At most SIM_CACHE_SIZE
+# results are kept, dropping the least recently used first (0 to disable), and each
+# is kept for SIM_CACHE_TTL hours after it was last used.
+SIM_CACHE_SIZE = int(os.getenv('SIM_CACHE_SIZE', 50))
+SIM_CACHE_TTL = float(os.getenv('SIM_CACHE_TTL', 24))
+
+# Compression used for everything the app stores in Redis: 'none', 'gzip', 'zstd'
+# (needs the zstandard package) or 'lz4' (needs the lz4 package), plus an optional
+# codec-specific level. Stored data records its codec, so this can be changed at
+# any time. Run bin/benchmark_codecs.py to compare them.
+BLOB_CODEC = os.getenv('BLOB_CODEC', 'gzip')
+BLOB_CODEC_LEVEL = int(os.getenv('BLOB_CODEC_LEVEL')) if os.getenv('BLOB_CODEC_LEVEL') else None
+
 # Flag for setting whether we use the users functionality provided by
 # Sciris in the webapp.
 USE_USERS = True
@@ -9,6 +9,17 @@ Last update: 2019may30
 ##############################################################
 
 import os
+import io
+import atexit
+import contextlib
+import csv
+import functools
+import concurrent.futures
+import concurrent.futures.process # For BrokenProcessPool
+import importlib
+import multiprocessing
+import pickle
+import hashlib
 import socket
 import psutil
 import numpy as np
@@ -16,7 +27,12 @@ import pylab as pl
 import pandas as pd
 import mpld3
 import re
+import threading
+import time
+import redis
+import celery
 import sciris as sc
+from collections import OrderedDict
 
 # Temporary fix until scirisweb is updated
 import werkzeug.serving
@@ -27,6 +43,7 @@ import scirisweb as sw
 import atomica as at
 from matplotlib.legend import Legend
 from . import version as appv
+from . import blobcodecs
 from atomica.function_parser import parse_function
 
 ROOTDIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), '')
@@ -38,6 +55,7 @@ pl.rc('font', size=14)
 RPC_dict = {} # Dictionary to hold all of the registered RPCs in this module.
 RPC = sw.RPCwrapper(RPC_dict) # RPC registration decorator factory created using call to make_RPC().
 datastore = None # Populated by find_datastore(), which has to be called before any of the other functions
+appconfig = None # The config module passed to find_datastore(), used for app-specific settings
 
 
 ###############################################################
@@ -94,12 +112,54 @@ def find_datastore(config):
     Ensure the datastore is loaded -- note, must be called externally since config
     is required as an input argument.
     '''
-    global datastore
+    global datastore, appconfig
+    if appconfig is None:
+        appconfig = config
     if datastore is None:
         datastore = sw.get_datastore(config=config)
     return datastore # So can be used externally
 
 
+def get_setting(key, default=None):
+    ''' Return an app-specific setting from the config module, falling back to the default if not set '''
+    return getattr(appconfig, key, default)
+
+
+tb_framework = None # Loaded by get_tb_framework()
+
+def tb_framework_key(filename):
+    '''
+    Return the key the TB framework read from a spreadsheet is stored under, e.g.
+    'tbframework::<Atomica version>::<sha1 of the spreadsheet>'
+    '''
+    with open(filename, 'rb') as f:
+        sha = hashlib.sha1(f.read()).hexdigest()
+    return 'tbframework::%s::%s' % (at.__version__, sha)
+
+def get_tb_framework():
+    '''
+    Return a copy of the TB framework. Projects only share a stored framework (see
+    PROJECT_COMPONENTS) if their frameworks pickle identically, which frameworks read
+    from the spreadsheet separately don't, since each gets its own UID and creation date.
+    So the first process to read the spreadsheet stores the framework under a hash of the
+    spreadsheet, and every process, including ones started later, uses that copy.
+    '''
+    global tb_framework
+    if tb_framework is None:
+        filename = ROOTDIR+'optima_tb_framework.xlsx'
+        key = tb_framework_key(filename)
+        raw = datastore.redis.get(key)
+        if raw is None:
+            framework = at.ProjectFramework(filename)
+            if datastore.redis.set(key, encode_blob(framework), nx=True):
+                tb_framework = framework
+            else: # Another process stored it first
+                raw = datastore.redis.get(key)
+        if raw is not None:
+            tb_framework = decode_blob(raw)
+    return sc.dcp(tb_framework)
+
+
 def CursorPosition():
     ''' Add the cursor position plugin to all plots '''
     plugin = mpld3.plugins.MousePosition(fontsize=12, fmt='.4r')
@@ -165,49 +225,240 @@ def run_query(token, query):
 def admin_grab_projects(username1, username2):
     ''' For use with run_query '''
     user1 = datastore.loaduser(username1)
-    for projectkey in user1.projects:
-        proj = load_project(projectkey)
-        save_new_project(proj, username2)
+    projs = [proj for proj in load_projects(user1.projects) if proj is not None]
+    save_new_projects(projs, username2)
     return user1.projects
 
 
 def admin_reset_projects(username):
-    user = datastore.loaduser(username)
-    for projectkey in user.projects:
-        try:    datastore.delete(projectkey)
-        except: pass
+    user = get_user(username)
+    try:    del_projects(user.projects, username=username) # So that shared components are dereferenced
+    except: pass
+    user = get_user(username)
     user.projects = []
     output = datastore.saveuser(user)
     return output
 
 
-def admin_dump_db(filename=None):
-    ''' For use with run_query -- dump the database '''
+DUMP_MAGIC = b'ATDUMP1\n' # Start of a database archive written by admin_dump_db()
+
+
+def admin_dump_db(filename=None, pattern='*', chunksize=1000, verbose=True):
+    '''
+    For use with run_query or bin/dumpdb.py -- dump the database to an archive file.
+
+    Keys are iterated with SCAN and fetched with pipelined DUMPs, chunksize keys at a
+    time, so memory use doesn't depend on the size of the database. Each chunk is
+    compressed with the configured codec and appended to the file as soon as it's
+    fetched, so a dump that's interrupted still contains every complete chunk. Use
+    admin_restore_db() to load the archive.
+    '''
     if filename is None:
         filename = 'db_%s.dump' % sc.getdate().split()[0]
-    allkeys = datastore.keys()
-    dbdict = {}
-    succeeded = []
+    T = sc.tic()
+    nkeys = 0
+    nbytes = 0
     failed = []
-    for key in allkeys:
-      try:
-        dbdict[key] = datastore.redis.get(key)
-        succeeded.append(key)
-      except:
-        failed.append(key)
-    sc.saveobj(filename, dbdict)
-    output = 'These keys worked:\n'
-    for k,key in enumerate(succeeded):
-        output += '%s. %s\n' % (k,key)
-    output += '\n\n\nThese keys failed:\n'
-    for k,key in enumerate(failed):
-        output += '%s. %s\n' % (k,key)
-    output += '\n\n\nGenerated file:\n'
+
+    def writechunk(f, keys):
+        nonlocal nkeys, nbytes
+        pipe = datastore.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        raw = pipe.execute()
+        entries = []
+        for key,dumped,pttl in zip(keys, raw[0::2], raw[1::2]):
+            if dumped is None: # Deleted since it was scanned
+                failed.append(key)
+            else:
+                entries.append((key, dumped, max(pttl, 0))) # A negative TTL means the key doesn't expire
+        chunk = compress_bytes(pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL))
+        f.write(len(chunk).to_bytes(8, 'big'))
+        f.write(chunk)
+        f.flush()
+        nkeys += len(entries)
+        nbytes += len(chunk) + 8
+        if verbose: print('Dumped %s keys (%0.1f MB) in %0.1f s' % (nkeys, nbytes/1e6, sc.toc(T, output=True)))
+        return None
+
+    with open(filename, 'wb') as f:
+        f.write(DUMP_MAGIC)
+        keys = []
+        for key in scan_keys(pattern, count=chunksize):
+            keys.append(key)
+            if len(keys) >= chunksize:
+                writechunk(f, keys)
+                keys = []
+        if keys:
+            writechunk(f, keys)
+
+    output = 'Dumped %s keys to %s (%0.1f MB)\n' % (nkeys, filename, nbytes/1e6)
+    if failed:
+        output += '\nThese keys were deleted during the dump:\n'
+        for k,key in enumerate(failed):
+            output += '%s. %s\n' % (k,key)
+    output += '\nGenerated file:\n'
     output += '%s' % os.getcwd()
     output += sc.runcommand('ls -lh %s' % filename)
     return output
 
 
+def admin_restore_db(filename, replace=False, verbose=True):
+    '''
+    For use with run_query or bin/restoredb.py -- restore an archive written by admin_dump_db().
+
+    The archive is read one chunk at a time and each chunk is written back in a single
+    pipeline. Existing keys are skipped unless replace=True. An incomplete last chunk,
+    e.g. from an interrupted dump, is reported and ignored.
+    '''
+    T = sc.tic()
+    nkeys = 0
+    skipped = 0
+    with open(filename, 'rb') as f:
+        if f.read(len(DUMP_MAGIC)) != DUMP_MAGIC:
+            raise Exception('File %s is not a database archive written by admin_dump_db()' % filename)
+        while True:
+            header = f.read(8)
+            if not header:
+                break
+            length = int.from_bytes(header, 'big')
+            chunk = f.read(length)
+            if len(header) < 8 or len(chunk) < length:
+                print('Warning: the last chunk of %s is incomplete and was not restored' % filename)
+                break
+            entries = pickle.loads(decompress_bytes(chunk))
+            pipe = datastore.redis.pipeline(transaction=False)
+            for key,dumped,pttl in entries:
+                pipe.restore(key, pttl, dumped, replace=replace)
+            for (key,dumped,pttl),output in zip(entries, pipe.execute(raise_on_error=False)):
+                if isinstance(output, redis.ResponseError):
+                    if 'BUSYKEY' in str(output): # The key exists, and replace=False; checked by RESTORE itself, so it's atomic
+                        skipped += 1
+                        continue
+                    raise Exception('Could not restore key "%s": %s' % (key, str(output)))
+                nkeys += 1
+            if verbose: print('Restored %s keys in %0.1f s' % (nkeys, sc.toc(T, output=True)))
+    output = 'Restored %s keys from %s' % (nkeys, filename)
+    if skipped:
+        output += ', skipped %s that already exist' % skipped
+    print(output)
+    return output
+
+
+def chunked(iterable, size):
+    ''' Iterate over an iterable in lists of up to size items '''
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def key_ages(keys):
+    ''' Return how many hours each key has gone unused, or None if Redis can't tell (e.g. with an LFU eviction policy) '''
+    pipe = datastore.redis.pipeline(transaction=False)
+    for key in keys:
+        pipe.object('idletime', key)
+    output = [idle/3600 if isinstance(idle, int) else None for idle in pipe.execute(raise_on_error=False)]
+    return output
+
+
+def referenced_results(batchsize=1000):
+    ''' Return the set of result keys that any project refers to, reading the projects in batches '''
+    output = set()
+    for keys in chunked(scan_keys('project::*', count=batchsize), batchsize):
+        for key,raw in zip(keys, datastore.redis.mget(keys)):
+            if raw is None:
+                continue
+            proj = decode_project(key, raw) # Not migrated, since only the results are needed
+            results = proj.__dict__.get('results', {})
+            for key,val in results.items():
+                for ref in [key, val]: # Could be either, depending on results caching
+                    if sc.isstring(ref):
+                        output.add(ref if ref.startswith('result::') else 'result::'+ref)
+    return output
+
+
+def user_exists(username):
+    ''' Check whether a user exists, without raising an exception if not '''
+    try:
+        return datastore.loaduser(username, die=False) is not None
+    except Exception:
+        return False
+
+
+def admin_collect_garbage(dryrun=False, ttls=None, batchsize=1000, verbose=True):
+    '''
+    For use with run_query, bin/collect_garbage.py or the Celery beat task -- delete keys that nothing refers to.
+
+    These are:
+        - results no project refers to, e.g. from abandoned browser sessions, plus their arrays
+        - result arrays whose result no longer exists
+        - figures of users that no longer exist
+        - task records, both the webapp's and Celery's, which nothing refers to once the task is done
+
+    Keys are only deleted once they haven't been read or written for the number of hours
+    given for their type in ttls (GC_TTLS in the config module by default), so e.g. results
+    that are being cached right now are safe. If Redis can't report how long a key has
+    been unused (with an LFU eviction policy), it's kept. Keys are scanned and deleted in
+    batches. With dryrun=True, nothing is deleted and the keys that would be are reported.
+    '''
+    if ttls is None:
+        ttls = get_setting('GC_TTLS', {'result':24, 'figures':7*24, 'task':7*24})
+    T = sc.tic()
+    found = sc.odict([('result',[]), ('resultarrays',[]), ('figures',[]), ('task',[])])
+
+    def sweep(pattern, objtype, isorphan=None, ttltype=None):
+        ''' Find the keys matching the pattern that nothing refers to and that have been unused for longer than the TTL of their type '''
+        for keys in chunked(scan_keys(pattern, count=batchsize), batchsize):
+            orphans = isorphan(keys) if isorphan else [True]*len(keys)
+            for key,orphan,age in zip(keys, orphans, key_ages(keys)):
+                if orphan and age is not None and age >= ttls[ttltype or objtype]:
+                    found[objtype].append(key)
+        return None
+
+    # Results and their arrays
+    try:
+        referenced = referenced_results(batchsize=batchsize)
+    except Exception as E:
+        print('Warning: could not read all projects, so results will not be collected: %s' % str(E))
+    else:
+        sweep('result::*', 'result', lambda keys: [key not in referenced for key in keys])
+        found['resultarrays'] += [result_arrays_key(key) for key in found['result']]
+        def noresult(keys):
+            pipe = datastore.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.exists('result::' + key.split('::')[-1])
+            return [not exists for exists in pipe.execute()]
+        sweep('resultarrays::*', 'resultarrays', noresult, ttltype='result')
+
+    # Figures
+    sweep('figures::*', 'figures', lambda keys: [not user_exists(key.split('::', 1)[-1]) for key in keys])
+
+    # Task records
+    for pattern in ['task::*', 'celery-task-meta-*']:
+        sweep(pattern, 'task')
+
+    # Delete
+    allkeys = list(set(key for keys in found.values() for key in keys))
+    if not dryrun:
+        for keys in chunked(allkeys, batchsize):
+            delete_keys(keys)
+    summary = ', '.join(['%s %s' % (len(keys), objtype) for objtype,keys in found.items()])
+    output = {'dryrun':dryrun, 'counts':{objtype:len(keys) for objtype,keys in found.items()}, 'keys':found}
+    if verbose:
+        print('%s %s keys (%s) in %0.1f s' % ('Would delete' if dryrun else 'Deleted', len(allkeys), summary, sc.toc(T, output=True)))
+        if dryrun:
+            for objtype,keys in found.items():
+                for key in keys:
+                    print('  %s' % key)
+    return output
+
+
 def admin_upload_db(pw, filename=None, host=None):
     ''' For use with run_query -- upload a previously dumped database '''
     def nosshpass():
@@ -256,12 +507,590 @@ def admin_upload_db(pw, filename=None, host=None):
 ### Datastore functions
 ##################################################################################
 
+class ProjectCache(sc.prettyobj):
+    '''
+    Per-process LRU cache of deserialized projects
+
+    Each entry stores the project's modification token at the time it was cached. The
+    token is incremented by every save_project() call, in any process, so a cached
+    project is only used if nobody has saved it since. A project without a token, i.e.
+    one that hasn't been saved by this version of the app, is at version 0, like in
+    parse_version(). Projects are copied on the
+    way in and on the way out, so callers are free to modify what they get back.
+    '''
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict() # Maps project key to (token, project), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock() # RPCs are served from multiple threads
+        return None
+
+    def get(self, key, token):
+        ''' Return a copy of the cached project, or None if it's missing or out of date '''
+        version = parse_version(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return sc.dcp(entry[1])
+
+    def put(self, key, token, project):
+        ''' Store a copy of a project, evicting the least recently used entries if the cache is full '''
+        maxsize = self.maxsize if self.maxsize is not None else get_setting('PROJECT_CACHE_SIZE', 10)
+        if not maxsize:
+            return None
+        project = sc.dcp(project)
+        with self.lock:
+            self.entries[key] = (parse_version(token), project)
+            self.entries.move_to_end(key)
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return None
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        return None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        return None
+
+    def stats(self):
+        with self.lock:
+            output = {'size':len(self.entries), 'maxsize':self.maxsize if self.maxsize is not None else get_setting('PROJECT_CACHE_SIZE', 10),
+                      'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions}
+        return output
+
+
+project_cache = ProjectCache() # The size is read from PROJECT_CACHE_SIZE in the config
+
+
+def project_aux_key(project_key, objtype):
+    ''' Return the key of a record stored alongside a project, e.g. 'projecttoken::<uid>' '''
+    key = datastore.getkey(key=project_key, objtype='project')
+    return objtype + '::' + key.split('::')[-1]
+
+
+def project_token_key(project_key):
+    ''' Return the datastore key for the modification token of a project '''
+    return project_aux_key(project_key, 'projecttoken')
+
+
+def scan_keys(pattern='*', count=1000):
+    ''' Iterate over the keys matching a pattern without blocking Redis, unlike datastore.keys() '''
+    for key in datastore.redis.scan_iter(match=pattern, count=count):
+        yield key.decode() if isinstance(key, bytes) else key
+
+
+class ProjectConflictError(Exception):
+    ''' Raised when saving a project that has been saved by another request since it was loaded '''
+
+    def __init__(self, project_key, expected=None, current=None):
+        self.project_key = project_key
+        self.expected = expected
+        self.current = current
+        errormsg = 'Project %s was changed by another request while this one was running; please reload it and try again' % project_key
+        if expected is not None:
+            errormsg += ' (loaded version %s, current version %s)' % (expected, current)
+        super().__init__(errormsg)
+
+
+def parse_version(token):
+    ''' Convert a raw modification token into a project version number; 0 means never saved with a token '''
+    return int(token) if token is not None else 0
+
+
+def get_project_token(project_key):
+    ''' Return the current modification token of a project, or None if it has never been saved by this webapp version '''
+    token = datastore.redis.get(project_token_key(project_key))
+    return token
+
+
+@RPC()
+def get_project_cache_stats():
+    ''' Return the hit/miss/eviction counters for this process's project cache, and those of its component cache '''
+    output = project_cache.stats()
+    output['components'] = component_cache.stats()
+    print('Project cache stats: %s' % output)
+    return output
+
+
+def compress_bytes(data):
+    ''' Compress bytes with the codec and level set in the config module (BLOB_CODEC and BLOB_CODEC_LEVEL) '''
+    codec = get_setting('BLOB_CODEC', blobcodecs.DEFAULT_CODEC)
+    level = get_setting('BLOB_CODEC_LEVEL', None)
+    output = blobcodecs.compress(data, codec=codec, level=level)
+    return output
+
+
+def decompress_bytes(raw):
+    ''' Decompress bytes stored by compress_bytes() with any codec, or gzipped before codecs were configurable '''
+    return blobcodecs.decompress(raw)
+
+
+def encode_blob(obj):
+    ''' Serialize an object for the datastore with the configured codec '''
+    return compress_bytes(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def decode_blob(raw):
+    ''' Deserialize the raw bytes of an object stored by encode_blob(), or by datastore.saveblob() or sc.dumpstr() for older data '''
+    codec = blobcodecs.parse_header(raw)[0]
+    if codec is not None:
+        output = blobcodecs.loads(raw)
+    else:
+        output = sc.loadstr(raw)
+        if isinstance(output, sw.Blob):
+            output = output.load()
+    return output
+
+
+def load_blobs(keys, objtype=None, die=None):
+    '''
+    Load many blobs with a single MGET rather than one round trip per key. Returns
+    a list matching the keys, with None for missing keys unless die=True.
+    '''
+    keys = [datastore.getkey(key=key, objtype=objtype) for key in keys]
+    if not keys:
+        return []
+    output = []
+    for key,raw in zip(keys, datastore.redis.mget(keys)):
+        if raw is None:
+            errormsg = 'Datastore key "%s" not found' % key
+            if die: raise Exception(errormsg)
+            else:   print('Warning: %s' % errormsg)
+            output.append(None)
+        else:
+            output.append(decode_blob(raw))
+    return output
+
+
+def save_blobs(objs, objtype, keys=None, pipe=None):
+    '''
+    Save many objects in a single pipelined request. Keys are generated from the object
+    UIDs unless supplied. If a pipeline is passed in, the writes are queued on it and
+    it's up to the caller to execute it.
+    '''
+    if keys is None:
+        keys = [None]*len(objs)
+    keys = [datastore.getkey(key=key, objtype=objtype, obj=obj, forcetype=True) for key,obj in zip(keys, objs)]
+    execute = pipe is None
+    if pipe is None:
+        pipe = datastore.redis.pipeline(transaction=False)
+    for key,obj in zip(keys, objs):
+        pipe.set(key, encode_blob(obj))
+    if execute:
+        pipe.execute()
+    return keys
+
+
+def delete_keys(keys):
+    ''' Delete many datastore keys in a single request, returning the number deleted '''
+    keys = list(keys)
+    if not keys:
+        return 0
+    output = datastore.redis.delete(*keys)
+    return output
+
+
+PROJECT_COMPONENTS = ['framework', 'data', 'databook', 'progbook', 'parsets', 'progsets', 'scens', 'optim_jsons', 'webapp'] # Project attributes stored separately from the rest of the project, once under their hash, and shared between projects, e.g. copies
+
+# Decrement the reference count of a component, and if nothing refers to it any more, expire it after the number of seconds given
+DECREF_SCRIPT = '''
+local refs = redis.call('DECR', KEYS[1])
+if refs <= 0 then
+    redis.call('DEL', KEYS[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+return refs
+'''
+
+
+class LazyProject(at.Project):
+    '''
+    A Project whose components (see PROJECT_COMPONENTS) are loaded from the datastore
+    the first time they're accessed. The rest of the project (the "shell") is loaded
+    up front. Created by load_project(); use materialize_project() to turn it back into
+    a plain Project, e.g. before pickling it for the user to download.
+    '''
+
+    def __getattr__(self, attr):
+        # Only called if the attribute isn't found normally, i.e. it's a component that hasn't been loaded yet
+        hashes = self.__dict__.get('_component_hashes', {})
+        if attr not in hashes:
+            raise AttributeError("'%s' object has no attribute '%s'" % (type(self).__name__, attr))
+        load_project_components(self, [attr])
+        return self.__dict__[attr]
+
+    def __setstate__(self, d):
+        self.__dict__ = d # Lazy projects are always the current version, so skip migration
+
+
+def project_component_key(project_key, name):
+    ''' Return the key a project component was stored under before components were all stored by hash, e.g. 'projectcomponent::<uid>::parsets' '''
+    return project_aux_key(project_key, 'projectcomponent') + '::' + name
+
+
+def content_key(sha):
+    ''' Return the key a component is stored under, e.g. 'content::<sha1>' '''
+    return 'content::' + sha
+
+
+def content_refs_key(sha):
+    ''' Return the key of the reference count of a component '''
+    return 'contentrefs::' + sha
+
+
+class ComponentCache(sc.prettyobj):
+    '''
+    Per-process LRU cache of the pickles of project components, by hash
+
+    Components are stored under their hash, so a cached pickle never goes out of date.
+    Each load unpickles a fresh copy, so callers are free to modify what they get back.
+    The cache is limited by the total size of the pickles, in MB.
+    '''
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict() # Maps hash to pickle, least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        return None
+
+    def get(self, sha):
+        ''' Return the pickle of a component, or None if it isn't cached '''
+        with self.lock:
+            picklestr = self.entries.get(sha)
+            if picklestr is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(sha)
+            self.hits += 1
+        return picklestr
+
+    def put(self, sha, picklestr):
+        ''' Store the pickle of a component, evicting the least recently used ones if the cache is full '''
+        maxsize = 1e6*(self.maxsize if self.maxsize is not None else get_setting('COMPONENT_CACHE_SIZE', 200))
+        if len(picklestr) > maxsize:
+            return None
+        with self.lock:
+            if sha not in self.entries:
+                self.entries[sha] = picklestr
+                self.size += len(picklestr)
+            self.entries.move_to_end(sha)
+            while self.size > maxsize:
+                self.size -= len(self.entries.popitem(last=False)[1])
+        return None
+
+    def stats(self):
+        with self.lock:
+            output = {'size':len(self.entries), 'MB':self.size/1e6, 'hits':self.hits, 'misses':self.misses}
+        return output
+
+
+component_cache = ComponentCache() # The size is read from COMPONENT_CACHE_SIZE in the config
+
+
+def component_hashes_key(project_key):
+    ''' Return the key of the hash of a project's stored components, used to maintain the shared component reference counts '''
+    return project_aux_key(project_key, 'projectcomponents')
+
+
+def load_component_hashes(project_keys):
+    ''' Return the hashes of the components currently stored for each project, in a single request '''
+    pipe = datastore.redis.pipeline(transaction=False)
+    for key in project_keys:
+        pipe.hgetall(component_hashes_key(key))
+    output = [{name.decode():sha.decode() for name,sha in raw.items()} for raw in pipe.execute()]
+    return output
+
+
+decref_script = None # Registered by release_components()
+
+def release_components(project_key, hashes, pipe):
+    '''
+    Queue the dereferencing of stored components on the pipeline. Components nothing
+    refers to any more are kept for COMPONENT_EXPIRY hours, so that requests that loaded
+    the project before it changed can still load them.
+    '''
+    global decref_script
+    if decref_script is None:
+        decref_script = datastore.redis.register_script(DECREF_SCRIPT)
+    expiry = int(3600*float(get_setting('COMPONENT_EXPIRY', 1)))
+    for name,sha in hashes.items():
+        decref_script(keys=[content_refs_key(sha), content_key(sha)], args=[expiry], client=pipe)
+    return None
+
+
+def encode_component(obj):
+    ''' Return the pickle of a project component and its hash, used to tell whether it has changed '''
+    picklestr = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    return picklestr, hashlib.sha1(picklestr).hexdigest()
+
+
+def load_project_components(proj, names=None):
+    ''' Load some or all of the components of a LazyProject that haven't been loaded yet, in a single request '''
+    source = proj.__dict__['_component_source']
+    hashes = proj.__dict__['_component_hashes']
+    if names is None:
+        names = [name for name in hashes if name not in proj.__dict__]
+    if not names:
+        return proj
+    picklestrs = {name:component_cache.get(hashes[name]) for name in names}
+    missing = [name for name in names if picklestrs[name] is None]
+    raws = datastore.redis.mget([content_key(hashes[name]) for name in missing]) if missing else []
+    for name,raw in zip(missing, raws):
+        if raw is None: # Projects saved before components were all stored by hash store some under their own key
+            raw = datastore.redis.get(project_component_key(source, name))
+        if raw is None:
+            if parse_version(get_project_token(source)) != proj.__dict__.get('_loaded_version'): # Saved since, and the old component has expired
+                raise ProjectConflictError(source) # So edit_project() retries it
+            raise Exception('Component "%s" of project %s is missing from the datastore' % (name, source))
+        picklestr = decompress_bytes(raw)
+        if hashlib.sha1(picklestr).hexdigest() != hashes[name]: # Stored under the project's own key, and saved since the shell was loaded
+            raise ProjectConflictError(source)
+        component_cache.put(hashes[name], picklestr)
+        picklestrs[name] = picklestr
+    for name in names:
+        proj.__dict__[name] = pickle.loads(picklestrs[name])
+    return proj
+
+
+def materialize_project(proj):
+    ''' Load all the components of a LazyProject and turn it into a plain Project, in place '''
+    if isinstance(proj, LazyProject):
+        load_project_components(proj)
+        proj.__dict__.pop('_component_source')
+        proj.__dict__.pop('_component_hashes')
+        proj.__class__ = at.Project
+    return proj
+
+
+def project_from_shell(key, shell):
+    ''' Turn a project shell, as stored by save_projects(), into a LazyProject. It isn't migrated; see migrate_project(). '''
+    proj = LazyProject.__new__(LazyProject)
+    proj.__dict__.update(shell['state'])
+    proj._component_source = key
+    proj._component_hashes = dict(shell['hashes'])
+    return proj
+
+
+class UnmigratedProject(at.Project):
+    '''
+    Stands in for Project when unpickling a stored project, so that migration isn't run
+    as a side effect of unpickling -- see decode_project(). It's turned back into a
+    Project by migrate_project() or as_project().
+    '''
+
+    def __setstate__(self, d):
+        self.__dict__ = d
+
+
+class ProjectUnpickler(pickle.Unpickler):
+    ''' Unpickle Projects as UnmigratedProjects '''
+
+    def find_class(self, module, name):
+        cls = super().find_class(module, name)
+        if cls is at.Project:
+            cls = UnmigratedProject
+        return cls
+
+
+def unpickle_unmigrated(picklestr):
+    ''' Unpickle bytes that may contain Projects, without migrating them '''
+    return ProjectUnpickler(io.BytesIO(picklestr)).load()
+
+
+def decode_project(key, raw):
+    '''
+    Deserialize a stored project without migrating it. A shell becomes a LazyProject and
+    a project stored in full (before shells were introduced) an UnmigratedProject. If a
+    project can't be unpickled this way, e.g. because it refers to classes that have since
+    been renamed, it's loaded the normal way, which migrates it.
+    '''
+    try:
+        proj = unpickle_unmigrated(decompress_bytes(raw))
+        if isinstance(proj, sw.Blob): # Stored by datastore.saveblob(), which gzips the project inside the Blob
+            proj = unpickle_unmigrated(decompress_bytes(proj.obj)) if isinstance(proj.obj, bytes) else proj.obj
+    except Exception as E:
+        print('Warning: could not load project %s without migrating it, loading it normally: %s' % (key, str(E)))
+        proj = decode_blob(raw)
+    if isinstance(proj, dict) and proj.get('project_shell'):
+        proj = project_from_shell(key, proj)
+    return proj
+
+
+def as_project(proj):
+    ''' Turn an UnmigratedProject into a Project, in place, once it's been migrated or doesn't need to be '''
+    if type(proj) is UnmigratedProject:
+        proj.__class__ = at.Project
+    return proj
+
+
+def needs_migration(proj):
+    ''' Check whether a project was stored by a different version of Atomica '''
+    return proj.version != at.__version__
+
+
+def migrate_project(proj):
+    '''
+    Migrate a project from decode_project() to the current version of Atomica, in a single
+    pass, and record the versions it was migrated between in proj.migration. If any of the
+    migrations may change the results, _update_required is set by Atomica, and the project
+    can't be saved -- the user has to make an updated copy of it.
+    '''
+    source = proj.version
+    proj = as_project(materialize_project(proj))
+    proj = at.migration.migrate(proj)
+    proj.migration = sc.odict([('source', source), ('target', proj.version), ('date', sc.now(utc=True)), ('changes_results', bool(proj._update_required))])
+    return proj
+
+
+def watch_components(key, project, pipe, storedhashes):
+    '''
+    Prepare a project for split_project(), before the transaction that saves it starts,
+    and return the hashes of its stored components that split_project() can rely on.
+
+    Stored components that are still under the project's own key, since they were saved
+    before components were all stored by hash, are left out of the hashes returned, so
+    that they're written again. The components of a LazyProject that haven't been loaded
+    are WATCHed, so that the transaction fails if one of them expires before the new
+    reference to it is added, and loaded if they aren't stored by hash either.
+    '''
+    lazyhashes = project._component_hashes if isinstance(project, LazyProject) else {}
+    unloaded = [name for name in lazyhashes if name not in project.__dict__]
+    if not storedhashes and not unloaded:
+        return storedhashes
+    if unloaded:
+        pipe.watch(*[content_key(lazyhashes[name]) for name in unloaded])
+    checkpipe = datastore.redis.pipeline(transaction=False) # After the WATCH, so it's still atomic with the save
+    for name in storedhashes:
+        checkpipe.exists(project_component_key(key, name))
+    for name in unloaded:
+        checkpipe.exists(content_key(lazyhashes[name]))
+    exists = checkpipe.execute()
+    legacy = [name for name,found in zip(storedhashes, exists) if found]
+    load_project_components(project, [name for name,found in zip(unloaded, exists[len(storedhashes):]) if not found])
+    output = {name:sha for name,sha in storedhashes.items() if name not in legacy}
+    return output
+
+
+def split_project(key, project, pipe, storedhashes):
+    '''
+    Queue writes on the pipeline for the components of a project that differ from the
+    ones currently stored under its key, and return the shell to store under the
+    project key. Components are stored under their hash, written with SET NX so only if
+    no other project (or earlier version of this one) has them already, and their
+    reference count is incremented in the same transaction. The stored hashes are the
+    ones returned by watch_components(), which has to be called first.
+    '''
+    lazyhashes = project._component_hashes if isinstance(project, LazyProject) else {}
+    hashes = {}
+    for name in PROJECT_COMPONENTS:
+        if name in project.__dict__:
+            picklestr,hashes[name] = encode_component(project.__dict__[name])
+        elif name in lazyhashes: # Not loaded, so it can't have changed
+            picklestr,hashes[name] = None,lazyhashes[name]
+        else:
+            continue
+        if hashes[name] == storedhashes.get(name):
+            continue
+        if picklestr is not None:
+            pipe.set(content_key(hashes[name]), compress_bytes(picklestr), nx=True)
+            component_cache.put(hashes[name], picklestr)
+        pipe.incr(content_refs_key(hashes[name])) # If it wasn't loaded, watch_components() has checked it exists
+        pipe.persist(content_key(hashes[name])) # In case nothing referred to it and it was due to expire
+
+    # Release the stored components that have been replaced or removed
+    release_components(key, {name:sha for name,sha in storedhashes.items() if hashes.get(name) != sha}, pipe)
+    pipe.delete(*[project_component_key(key, name) for name in PROJECT_COMPONENTS]) # Any stored under the project's own key before components were all stored by hash
+    pipe.delete(component_hashes_key(key))
+    if hashes:
+        pipe.hset(component_hashes_key(key), mapping=hashes)
+
+    state = {attr:val for attr,val in project.__dict__.items() if attr not in PROJECT_COMPONENTS and not attr.startswith('_component') and attr != '_loaded_version'}
+    shell = {'project_shell':True, 'state':state, 'hashes':hashes}
+    return shell
+
+
+def load_projects(project_keys, die=None, safe_migration=False):
+    '''
+    Load many projects in a constant number of round trips: one to check the modification
+    tokens, one to fetch the projects that aren't in the project cache, and, for safe
+    migration of cached projects, one to refetch the projects that would change on
+    migration. Each project is deserialized and migrated once. Projects that were
+    migrated without changing their results are written back, so they're only migrated
+    once. See load_project() for the arguments.
+    '''
+    keys = [datastore.getkey(key=key, objtype='project') for key in project_keys]
+    if not keys:
+        return []
+    tokens = datastore.redis.mget([project_token_key(key) for key in keys])
+    projects = [project_cache.get(key, token) for key,token in zip(keys, tokens)]
+    missing = [i for i,proj in enumerate(projects) if proj is None]
+    originals = {} # Unmigrated copies of projects whose migration changes results, for safe migration
+    writeback = []
+    raws = datastore.redis.mget([keys[i] for i in missing]) if missing else []
+    for i,raw in zip(missing, raws):
+        if raw is None:
+            errormsg = 'Datastore key "%s" not found' % keys[i]
+            if die: raise Exception(errormsg)
+            else:   print('Warning: %s' % errormsg)
+            continue
+        proj = decode_project(keys[i], raw)
+        if needs_migration(proj):
+            original = sc.dcp(proj) if safe_migration else None # Copied before migration, which may modify the project in place
+            proj = migrate_project(proj)
+            if proj._update_required:
+                originals[i] = original
+            else:
+                writeback.append(i)
+        proj = as_project(proj)
+        project_cache.put(keys[i], tokens[i], proj)
+        projects[i] = proj
+    for proj,token in zip(projects, tokens):
+        if proj is not None:
+            proj.__dict__['_loaded_version'] = parse_version(token) # Checked by save_projects()
+
+    # Write back projects that were migrated safely
+    if writeback:
+        try:
+            save_projects([projects[i] for i in writeback], touch=False)
+        except Exception as E: # Not essential, e.g. if another request saved the project first
+            print('Warning: could not save migrated projects: %s' % str(E))
+
+    # For safe migration, return the unmigrated versions of projects whose results would change
+    if safe_migration:
+        unsafe = [i for i,proj in enumerate(projects) if proj is not None and proj._update_required]
+        refetch = [i for i in unsafe if i not in originals]
+        for i,raw in zip(refetch, datastore.redis.mget([keys[i] for i in refetch]) if refetch else []):
+            if raw is not None:
+                originals[i] = decode_project(keys[i], raw)
+        for i in unsafe:
+            if originals.get(i) is not None:
+                projects[i] = as_project(originals[i])
+                projects[i].__dict__['_loaded_version'] = parse_version(tokens[i])
+    return projects
+
+
 # Migration now automatically happens for all of these
 def load_project(project_key, die=None, safe_migration=False):
     """
     Return a Project object
 
-    Optionally skip migration
+    Optionally skip migration. Projects are served from the in-process project cache
+    when it holds an up-to-date copy.
 
     :param project_key:
     :param die:
@@ -270,35 +1099,447 @@ def load_project(project_key, die=None, safe_migration=False):
 
     :return:
     """
-    proj = datastore.loadblob(project_key, objtype='project', die=die)
-    if safe_migration and proj._update_required:
-        at.migration.SKIP_MIGRATION = True
-        proj = datastore.loadblob(project_key, objtype='project', die=die)
-        at.migration.SKIP_MIGRATION = False
+    proj = load_projects([project_key], die=die, safe_migration=safe_migration)[0]
     return proj
 
 def load_framework(framework_key, die=None):
-    output = datastore.loadblob(framework_key, objtype='framework', die=die)
+    output = load_blobs([framework_key], objtype='framework', die=die)[0]
     return output
 
-def load_result(result_key, die=False):
-    output = datastore.loadblob(result_key, objtype='result', die=die)
+def load_frameworks(framework_keys, die=None):
+    output = load_blobs(framework_keys, objtype='framework', die=die)
     return output
 
+def load_result(result_key, die=False, variables=None):
+    '''
+    Load a cached Result, or list of Results. By default the arrays of every model variable
+    are loaded; pass a list of variable names to only load what's needed for those, or an
+    empty list to load none. The rest can be loaded later with load_result_variables().
+    '''
+    output = load_blobs([result_key], objtype='result', die=die)[0]
+    if output is not None:
+        load_result_variables(output, names=variables)
+    return output
+
+def save_projects(projects, die=None, touch=True):
+    '''
+    Save many projects in a single transaction, together with their modification
+    tokens and summary records. Each project is stored as a shell plus separately
+    stored components, and only the components that have changed are written.
+
+    The modification token doubles as the project's version: a project that was
+    loaded from the datastore is only saved if its version hasn't changed since,
+    otherwise a ProjectConflictError is raised and nothing is saved. The check is
+    atomic with the write. Projects that weren't loaded (e.g. new ones) are saved
+    unconditionally. The modification time is updated unless touch=False. Returns the
+    list of project keys.
+    '''
+    for project in projects:
+        if project._update_required:
+            raise Exception('Cannot save an un-migrated project, create an updated copy first')
+        if touch:
+            project.modified = sc.now(utc=True)
+    keys = [datastore.getkey(objtype='project', obj=project, forcetype=True) for project in projects]
+    summaries = summaries_for_save(keys, projects)
+    tokenkeys = [project_token_key(key) for key in keys]
+    pipe = datastore.redis.pipeline(transaction=True) # So the shell and its components are always consistent
+    try:
+        pipe.watch(*tokenkeys) # The transaction fails if any of the projects is saved before it executes
+        for key,project,token in zip(keys, projects, pipe.mget(tokenkeys)):
+            expected = project.__dict__.get('_loaded_version')
+            if expected is not None and expected != parse_version(token):
+                raise ProjectConflictError(key, expected, parse_version(token))
+        storedhashes = load_component_hashes(keys)
+        storedhashes = [watch_components(key, project, pipe, hashes) for key,project,hashes in zip(keys, projects, storedhashes)]
+        pipe.multi()
+        for tokenkey in tokenkeys:
+            pipe.incr(tokenkey) # Mark cached copies in all processes as stale
+        shells = [split_project(key, project, pipe, hashes) for key,project,hashes in zip(keys, projects, storedhashes)]
+        save_blobs(shells, objtype='project', keys=keys, pipe=pipe)
+        for key,project,summary in zip(keys, projects, summaries):
+            project_cache.invalidate(key)
+            if summary is not None:
+                save_project_summary(key, summary, pipe=pipe)
+                pipe.hset(name_index_key('project', summary['username']), key, project.name)
+        versions = pipe.execute()[:len(keys)]
+    except redis.WatchError:
+        raise ProjectConflictError(keys[0] if len(keys) == 1 else ', '.join(keys))
+    finally:
+        pipe.reset()
+    for key,project,shell,version in zip(keys, projects, shells, versions):
+        project.__dict__['_loaded_version'] = version # So the same object can be saved again
+        if isinstance(project, LazyProject): # So the next save of this object only writes what changes after this
+            project._component_source = key
+            project._component_hashes = shell['hashes']
+    return keys
+
 def save_project(project, die=None):
-    if project._update_required:
-        raise Exception('Cannot save an un-migrated project, create an updated copy first')
-    project.modified = sc.now(utc=True)
-    output = datastore.saveblob(obj=project, objtype='project', die=die, forcetype=True)
+    output = save_projects([project], die=die)[0]
+    return output
+
+
+def edit_project(project_key, edit, retries=None):
+    '''
+    Load a project, apply an edit function to it, and save it. If another request saves
+    the project in the meantime, the project is reloaded and the edit applied again, up
+    to PROJECT_SAVE_RETRIES times. Only use this for edits that don't depend on the rest
+    of the project, e.g. renaming it or replacing its scenarios. Returns the output of
+    the edit function.
+    '''
+    if retries is None:
+        retries = get_setting('PROJECT_SAVE_RETRIES', 3)
+    for attempt in range(retries+1):
+        proj = load_project(project_key, die=True)
+        output = edit(proj)
+        try:
+            save_project(proj)
+            return output
+        except ProjectConflictError as E:
+            if attempt == retries:
+                raise E
+            print('Warning: %s, retrying (%s of %s)' % (str(E), attempt+1, retries))
     return output
 
 def save_framework(framework, die=None):
-    framework.modified = sc.now(utc=True)
-    output = datastore.saveblob(obj=framework, objtype='framework', die=die, forcetype=True)
+    output = save_frameworks([framework], die=die)[0]
+    return output
+
+def save_frameworks(frameworks, die=None):
+    for framework in frameworks:
+        framework.modified = sc.now(utc=True)
+    pipe = datastore.redis.pipeline(transaction=False)
+    output = save_blobs(frameworks, objtype='framework', pipe=pipe)
+    for key,framework in zip(output, frameworks):
+        if hasattr(framework, 'webapp'):
+            pipe.hset(name_index_key('framework', framework.webapp.username), key, framework.name)
+    pipe.execute()
+    return output
+
+
+def name_index_key(objtype, username):
+    ''' Return the key of the hash that maps the keys of a user's projects (or frameworks) to their names '''
+    return '%snames::%s' % (objtype, username)
+
+
+def get_user_names(user, objtype='project'):
+    '''
+    Return the names of all of a user's projects or frameworks, for making new names
+    unique, without loading them. The names come from the user's name index, which is
+    kept up to date by the save and delete functions. Entries missing from the index
+    (e.g. in databases created before it existed) are filled in, and stale ones removed.
+    '''
+    keys = user.projects if objtype == 'project' else user.frameworks
+    indexkey = name_index_key(objtype, user.username)
+    index = {key.decode():name.decode() for key,name in datastore.redis.hgetall(indexkey).items()}
+    missing = [key for key in keys if key not in index]
+    stale = [key for key in index if key not in keys]
+    if missing:
+        print('Adding %s entries to the %s name index for user "%s"' % (len(missing), objtype, user.username))
+        if objtype == 'project':
+            summaries = load_project_summaries(missing)
+            unsummarized = [key for key,summary in zip(missing, summaries) if summary is None]
+            names = {key:summary['name'] for key,summary in zip(missing, summaries) if summary is not None}
+            names.update({key:proj.name for key,proj in zip(unsummarized, load_projects(unsummarized)) if proj is not None})
+        else:
+            names = {key:frame.name for key,frame in zip(missing, load_frameworks(missing)) if frame is not None}
+        names = {key:names.get(key, '') for key in missing} # Store unreadable entries too, so they aren't retried every time
+        datastore.redis.hset(indexkey, mapping=names)
+        index.update(names)
+    if stale:
+        datastore.redis.hdel(indexkey, *stale)
+        for key in stale:
+            index.pop(key)
+    output = [name for name in index.values() if name]
     return output
 
 def save_result(result, key=None, die=None):
-    output = datastore.saveblob(obj=result, objtype='result', key=key, die=die, forcetype=True)
+    '''
+    Save a Result, or list of Results, in columnar form: each array of each model variable
+    is stored as a separate field of a hash, so that plots can load only the variables they
+    need, and the rest of the result is stored as a blob. The result passed in is unchanged.
+    '''
+    results = sc.promotetolist(result)
+    load_result_variables(results) # A partially loaded result has to be completed before it can be stored again
+    if key is None and isinstance(result, list):
+        key = str(sc.uuid())
+    key = datastore.getkey(key=key, objtype='result', obj=None if isinstance(result, list) else result, forcetype=True)
+    arrayskey = result_arrays_key(key)
+    arrays = {}
+    removed = []
+    try:
+        for r,res in enumerate(results):
+            if getattr(res, 'model', None) is None:
+                continue
+            fields = {}
+            for (p,group,i),var in result_variables(res):
+                for attr,val in list(var.__dict__.items()):
+                    if isinstance(val, np.ndarray) and val.dtype.kind in 'biuf':
+                        field = '%s/%s/%s/%s/%s' % (r, p, group, i, attr)
+                        arrays[field] = compress_bytes(np.ascontiguousarray(val).tobytes())
+                        fields[field] = (p, group, i, attr, val.dtype.str, val.shape)
+                        removed.append((var, attr, val))
+                        var.__dict__[attr] = None
+            res._columnar = {'key':arrayskey, 'fields':fields, 'loaded':set()}
+        pipe = datastore.redis.pipeline(transaction=True)
+        pipe.set(key, encode_blob(result))
+        pipe.delete(arrayskey)
+        if arrays:
+            pipe.hset(arrayskey, mapping=arrays)
+        pipe.execute()
+    finally: # Put the arrays back
+        for var,attr,val in removed:
+            var.__dict__[attr] = val
+        for res in results:
+            if getattr(res, 'model', None) is not None: # Other objects, e.g. the frontier of a budget sweep, are stored as they are
+                res.__dict__.pop('_columnar', None)
+    return key
+
+
+RESULT_VARIABLE_GROUPS = ['comps', 'characs', 'pars', 'links'] # Population attributes holding the model variables that are stored columnwise
+
+
+def result_arrays_key(result_key):
+    ''' Return the key of the hash holding the arrays of a cached result, e.g. 'resultarrays::<uid>' '''
+    key = datastore.getkey(key=result_key, objtype='result')
+    return 'resultarrays::' + key.split('::')[-1]
+
+
+def result_variables(result):
+    ''' Iterate over the model variables of a Result, with their (population index, group, index) location '''
+    for p,pop in enumerate(result.model.pops):
+        for group in RESULT_VARIABLE_GROUPS:
+            for i,var in enumerate(getattr(pop, group, [])):
+                yield (p,group,i), var
+
+
+def output_variable_names(spec):
+    '''
+    Return the set of names a plot output specification could refer to, e.g. the variables
+    in a function like 'alive+dead' or a flow like 'sus:flow'. Nested lists and dicts, such
+    as aggregations or cascade definitions, are searched too. This may include names that
+    aren't variables, which is harmless.
+    '''
+    names = set()
+    if sc.isstring(spec):
+        names.update(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', spec))
+    elif isinstance(spec, dict):
+        for key,val in spec.items():
+            names.update(output_variable_names(key))
+            names.update(output_variable_names(val))
+    elif isinstance(spec, (list, tuple)):
+        for val in spec:
+            names.update(output_variable_names(val))
+    return names
+
+
+def needed_result_fields(result, names):
+    '''
+    Return the stored fields of a partially loaded Result that are needed for the named
+    variables. A variable that doesn't have stored arrays of its own (e.g. a characteristic
+    computed from its compartments) pulls in the variables it refers to. Flows are matched
+    by their parameter, source and destination.
+    '''
+    fields = result._columnar['fields']
+    locations = {(p,group,i):var for (p,group,i),var in result_variables(result)}
+    varfields = {}
+    for field,(p,group,i,attr,dtype,shape) in fields.items():
+        varfields.setdefault(id(locations[(p,group,i)]), []).append(field)
+    allvars = {id(var):var for var in locations.values()}
+
+    def matches(var, group):
+        if set(re.findall(r'[A-Za-z_][A-Za-z0-9_]*', str(getattr(var, 'name', '')))) & names:
+            return True
+        if group == 'links':
+            return any(getattr(getattr(var, attr, None), 'name', None) in names for attr in ['parameter', 'source', 'dest'])
+        return False
+
+    stack = [var for (p,group,i),var in locations.items() if matches(var, group)]
+    needed = set()
+    output = []
+    while stack:
+        var = stack.pop()
+        if id(var) in needed:
+            continue
+        needed.add(id(var))
+        if id(var) in varfields:
+            output += varfields[id(var)]
+        else: # Derived, so load what it's derived from
+            for val in var.__dict__.values():
+                refs = list(val.values()) if isinstance(val, dict) else (val if isinstance(val, (list, tuple)) else [val])
+                stack += [ref for ref in refs if id(ref) in allvars]
+    output = [field for field in output if field not in result._columnar['loaded']]
+    return output
+
+
+def load_result_variables(results, names=None):
+    '''
+    Load the arrays of Results from load_result() that are needed for the given variable
+    names, or all of them if names is None, in a single request. Results that are already
+    complete are unaffected.
+    '''
+    partial = [res for res in sc.promotetolist(results) if getattr(res, '_columnar', None)]
+    if names is not None:
+        names = output_variable_names(names)
+    requests = []
+    for res in partial:
+        if names is None:
+            fields = [field for field in res._columnar['fields'] if field not in res._columnar['loaded']]
+        else:
+            fields = needed_result_fields(res, names)
+        if fields:
+            requests.append((res, fields))
+    if requests:
+        pipe = datastore.redis.pipeline(transaction=False)
+        for res,fields in requests:
+            pipe.hmget(res._columnar['key'], fields)
+        for (res,fields),raws in zip(requests, pipe.execute()):
+            for field,raw in zip(fields, raws):
+                if raw is None:
+                    raise Exception('Array "%s" of result %s is missing from the datastore' % (field, res._columnar['key']))
+                p,group,i,attr,dtype,shape = res._columnar['fields'][field]
+                var = getattr(res.model.pops[p], group)[i]
+                var.__dict__[attr] = np.frombuffer(decompress_bytes(raw), dtype=dtype).reshape(shape).copy() # Copy, since buffers are read-only
+                res._columnar['loaded'].add(field)
+    for res in partial:
+        if len(res._columnar['loaded']) == len(res._columnar['fields']):
+            del res._columnar # Complete, so it's now an ordinary Result
+    return results
+
+
+def project_summary_key(project_key):
+    ''' Return the datastore key for the summary record of a project '''
+    return project_aux_key(project_key, 'projectsummary')
+
+
+def save_project_summary(project_key, summary, pipe=None):
+    '''
+    Store the small record used by the project list next to the project blob, so that
+    jsonify_projects() doesn't need to deserialize every project. The Atomica version is
+    stored too, since a new version may change what migration does to the project.
+    '''
+    summary = sc.dcp(summary)
+    summary['atversion'] = at.__version__
+    key = project_summary_key(project_key)
+    if pipe is None: pipe = datastore.redis
+    pipe.set(key, encode_blob(summary))
+    return key
+
+
+def load_project_summaries(project_keys):
+    '''
+    Fetch the summary records for many projects in a single round trip. Returns a list
+    with the summary for each key, or None if there is no summary or it was written by
+    a different version of Atomica.
+    '''
+    if not project_keys:
+        return []
+    raw = datastore.redis.mget([project_summary_key(key) for key in project_keys])
+    summaries = []
+    for rawsummary in raw:
+        summary = decode_blob(rawsummary) if rawsummary is not None else None
+        if summary is not None and summary.pop('atversion', None) != at.__version__:
+            summary = None
+        summaries.append(summary)
+    return summaries
+
+
+def admin_backfill_summaries(overwrite=False, verbose=True):
+    ''' For use with run_query or bin/backfill_summaries.py -- write summary records for projects that don't have one '''
+    written = []
+    failed = []
+    for key in scan_keys('project::*'):
+        try:
+            if not overwrite and load_project_summaries([key])[0] is not None:
+                continue
+            save_project_summary(key, jsonify_project(key))
+            written.append(key)
+            if verbose: print('Wrote summary for %s' % key)
+        except Exception as E:
+            failed.append(key)
+            print('Could not write summary for %s: %s' % (key, str(E)))
+    output = 'Wrote %s summaries, %s failed' % (len(written), len(failed))
+    print(output)
+    return output
+
+
+def migrate_stored_project(key, dryrun=False):
+    '''
+    Migrate a single stored project and save it back if its results don't change. Used
+    by admin_migrate_projects(); returns a small record of what happened.
+    '''
+    output = {'key':key, 'status':None, 'name':None, 'username':None, 'source':None, 'target':None, 'error':''}
+    try:
+        token = get_project_token(key)
+        raw = datastore.redis.get(key)
+        if raw is None:
+            output['status'] = 'missing'
+            return output
+        proj = decode_project(key, raw)
+        output['name'] = proj.name
+        output['source'] = proj.version
+        if not needs_migration(proj):
+            output['status'] = 'current'
+            return output
+        proj = migrate_project(proj)
+        output['target'] = proj.version
+        output['username'] = proj.webapp.username if hasattr(proj, 'webapp') else None
+        if proj._update_required:
+            output['status'] = 'update required'
+        elif dryrun:
+            output['status'] = 'migratable'
+        else:
+            proj.__dict__['_loaded_version'] = parse_version(token) # So it isn't saved over a concurrent change
+            save_projects([proj], touch=False)
+            output['status'] = 'migrated'
+    except ProjectConflictError as E:
+        output['status'] = 'conflict'
+        output['error'] = str(E)
+    except Exception as E:
+        output['status'] = 'failed'
+        output['error'] = repr(E)
+    return output
+
+
+def init_worker_process(configname):
+    ''' Set up the datastore and the config in a process of a pool, e.g. the admin_migrate_projects() pool '''
+    find_datastore(config=importlib.import_module(configname))
+    return None
+
+
+def admin_migrate_projects(processes=None, dryrun=False, reportfile=None, maxtasksperchild=20, verbose=True):
+    '''
+    For use with bin/migrate_projects.py -- migrate every stored project to the current
+    version of Atomica, e.g. before a deploy, so that users don't pay for migration on
+    their next load.
+
+    Projects are migrated in a pool of processes, each of which only holds one project at
+    a time and is restarted after maxtasksperchild projects, so memory use is bounded.
+    Projects whose results don't change are saved back; those whose results would change
+    need the user to make an updated copy (the update_project RPC), and are listed in the
+    report, which is written as CSV if a filename is given. With dryrun=True, nothing is
+    saved.
+    '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    T = sc.tic()
+    records = []
+    counts = sc.odict()
+    worker = functools.partial(migrate_stored_project, dryrun=dryrun)
+    with multiprocessing.Pool(processes=processes, initializer=init_worker_process, initargs=(appconfig.__name__,), maxtasksperchild=maxtasksperchild) as pool:
+        for r,record in enumerate(pool.imap_unordered(worker, scan_keys('project::*'))):
+            counts[record['status']] = counts.get(record['status'], 0) + 1
+            if record['status'] not in ['current', 'migrated', 'migratable']:
+                records.append(record)
+            if verbose and record['status'] not in ['current']:
+                print('%s: %s (%s) %s' % (r+1, record['key'], record['status'], record['error']))
+    if reportfile:
+        with open(reportfile, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['key', 'status', 'name', 'username', 'source', 'target', 'error'])
+            writer.writeheader()
+            writer.writerows(records)
+    summary = ', '.join(['%s %s' % (count, status) for status,count in counts.items()])
+    print('Checked %s projects in %0.1f s: %s' % (sum(counts.values()), sc.toc(T, output=True), summary))
+    output = {'counts':dict(counts), 'report':records}
     return output
 
 
@@ -307,34 +1548,48 @@ def save_new_project(proj, username=None, uid=None, verbose=True):
     If we're creating a new project, we need to do some operations on it to
     make sure it's valid for the webapp.
     '''
-    # Preliminaries
-    if verbose: print('Saving project %s as new...' % proj.uid)
-    new_project = sc.dcp(proj) # Copy the project..
-    new_project.uid = sc.uuid(uid) # Optionally allow the project to be saved with an explicit UID
+    keys,new_projects = save_new_projects([proj], username=username, uids=[uid], verbose=verbose)
+    return keys[0],new_projects[0]
 
-    # Get unique name
+
+def save_new_projects(projs, username=None, uids=None, verbose=True):
+    '''
+    Save several projects as new projects belonging to a user, using a constant number
+    of datastore requests. See save_new_project().
+    '''
+    # Preliminaries
+    if uids is None: uids = [None]*len(projs)
+    new_projects = []
+    for proj,uid in zip(projs, uids):
+        if verbose: print('Saving project %s as new...' % proj.uid)
+        new_project = sc.dcp(proj) # Copy the project..
+        new_project.__dict__.pop('_loaded_version', None) # It's a new project, so there's nothing to conflict with
+        new_project.uid = sc.uuid(uid) # Optionally allow the project to be saved with an explicit UID
+        new_projects.append(new_project)
+
+    # Get unique names
     user = get_user(username)
-    current_project_names = []
-    for project_key in user.projects:
-        proj = load_project(project_key)
-        current_project_names.append(proj.name)
-    new_project_name = sc.uniquename(new_project.name, namelist=current_project_names)
-    new_project.name = new_project_name
-
-    # Ensure it's a valid webapp project
-    if not hasattr(new_project, 'webapp'):
-        if verbose: print('Adding webapp attribute for username %s' % username)
-        new_project.webapp = sc.prettyobj()
-        new_project.webapp.username = username
-        new_project.webapp.tasks = []
-    new_project.webapp.username = username # Make sure we have the current username
+    current_project_names = get_user_names(user, 'project')
+    for new_project in new_projects:
+        new_project.name = sc.uniquename(new_project.name, namelist=current_project_names)
+        current_project_names.append(new_project.name)
+
+    # Ensure they're valid webapp projects
+    for new_project in new_projects:
+        if not hasattr(new_project, 'webapp'):
+            if verbose: print('Adding webapp attribute for username %s' % username)
+            new_project.webapp = sc.prettyobj()
+            new_project.webapp.username = username
+            new_project.webapp.tasks = []
+        new_project.webapp.username = username # Make sure we have the current username
 
     # Save all the things
-    key = save_project(new_project)
-    if key not in user.projects: # Let's not allow multiple copies
-        user.projects.append(key)
+    keys = save_projects(new_projects)
+    new_keys = [key for key in keys if key not in user.projects] # Let's not allow multiple copies
+    if new_keys:
+        user.projects.extend(new_keys)
         datastore.saveuser(user)
-    return key,new_project
+    return keys,new_projects
 
 
 def save_new_framework(framework, username=None):
@@ -348,10 +1603,7 @@ def save_new_framework(framework, username=None):
 
     # Get unique name
     user = get_user(username)
-    current_framework_names = []
-    for framework_key in user.frameworks:
-        proj = load_framework(framework_key)
-        current_framework_names.append(proj.name)
+    current_framework_names = get_user_names(user, 'framework')
     new_framework_name = sc.uniquename(new_framework.name, namelist=current_framework_names)
     new_framework.name = new_framework_name
 
@@ -369,19 +1621,48 @@ def save_new_framework(framework, username=None):
 
 @RPC() # Not usually called as an RPC
 def del_project(project_key, username=None, die=None):
-    key = datastore.getkey(key=project_key, objtype='project')
-    try:
-        project = load_project(key)
-    except Exception as E:
-        print('Warning: cannot delete project %s, not found (%s)' % (key, str(E)))
-    output = datastore.delete(key)
-    try:
-        if username is None: username = project.webapp.username
-        user = get_user(username)
-        user.projects.remove(key)
-        datastore.saveuser(user)
-    except Exception as E:
-        print('Warning: deleting project %s, but not found in user "%s" projects (%s)' % (project_key, username, str(E)))
+    output = del_projects([project_key], username=username, die=die)
+    return output
+
+
+def del_projects(project_keys, username=None, die=None):
+    '''
+    Delete several projects, along with their auxiliary records, and remove them from
+    their users' project lists, using a constant number of datastore requests. If
+    the username isn't supplied, it's read from the projects themselves.
+    '''
+    keys = [datastore.getkey(key=project_key, objtype='project') for project_key in project_keys]
+    if username is None:
+        projects = load_projects(keys)
+        usernames = []
+        for key,project in zip(keys, projects):
+            try:
+                usernames.append(project.webapp.username)
+            except Exception as E:
+                print('Warning: cannot delete project %s, not found (%s)' % (key, str(E)))
+                usernames.append(None)
+    else:
+        usernames = [username]*len(keys)
+    pipe = datastore.redis.pipeline(transaction=True)
+    for key,hashes in zip(keys, load_component_hashes(keys)):
+        release_components(key, hashes, pipe)
+    auxkeys = [auxkey for key in keys for auxkey in [project_token_key(key), project_summary_key(key), component_hashes_key(key), optimized_allocation_key(key)] + [project_component_key(key, name) for name in PROJECT_COMPONENTS]]
+    pipe.delete(*keys)
+    pipe.delete(*auxkeys)
+    output = pipe.execute()[-2] # The number of projects deleted
+    for key in keys:
+        project_cache.invalidate(key)
+    for this_username in set(usernames):
+        try:
+            user = get_user(this_username)
+            user_keys = [key for key,keyuser in zip(keys, usernames) if keyuser == this_username]
+            for key in user_keys:
+                if key in user.projects: user.projects.remove(key)
+                else: print('Warning: deleting project %s, but not found in user "%s" projects' % (key, this_username))
+            datastore.saveuser(user)
+            datastore.redis.hdel(name_index_key('project', this_username), *user_keys)
+        except Exception as E:
+            print('Warning: could not remove deleted projects from user "%s" (%s)' % (this_username, str(E)))
     return output
 
 
@@ -398,6 +1679,7 @@ def del_framework(framework_key, username=None, die=None):
         user = get_user(username)
         user.frameworks.remove(key)
         datastore.saveuser(user)
+        datastore.redis.hdel(name_index_key('framework', username), key)
     except Exception as E:
         print('Warning: deleting framework %s, but not found in user "%s" framework (%s)' % (framework_key, username, str(E)))
     return output
@@ -407,8 +1689,7 @@ def del_framework(framework_key, username=None, die=None):
 def delete_projects(project_keys, username=None):
     ''' Delete one or more projects '''
     project_keys = sc.promotetolist(project_keys)
-    for project_key in project_keys:
-        del_project(project_key, username=username)
+    del_projects(project_keys, username=username)
     return None
 
 
@@ -422,23 +1703,110 @@ def delete_frameworks(framework_keys, username=None):
 
 
 @RPC()
-def del_result(result_key, project_key, die=None):
+def del_result(result_key, project_key, die=None, project=None):
+    '''
+    Delete a cached result and remove it from its project. If the project has already
+    been loaded by the caller, pass it in: it will be modified in place and it's up to
+    the caller to save it.
+    '''
     key = datastore.getkey(key=result_key, objtype='result', forcetype=False)
-    output = datastore.delete(key, objtype='result')
+    datastore.redis.delete(optimization_checkpoint_key(result_key), optimization_progress_key(result_key)) # So that running it again starts afresh
+    output = delete_keys([key, result_arrays_key(key)])
     if not output:
         print('Warning: could not delete result %s, not found' % result_key)
-    project = load_project(project_key)
-    found = False
-    for key,val in project.results.items():
-        if result_key in [key, val]: # Could be either, depending on results caching
-            project.results.pop(key) # Remove it
-            found = True
-    if not found:
-        print('Warning: deleting result %s (%s), but not found in project "%s"' % (result_key, key, project_key))
-    if found: save_project(project) # Only save if required
+    def edit(project):
+        found = False
+        for key,val in list(project.results.items()):
+            if result_key in [key, val]: # Could be either, depending on results caching
+                project.results.pop(key) # Remove it
+                found = True
+        if not found:
+            print('Warning: deleting result %s, but not found in project "%s"' % (result_key, project_key))
+        return found
+    if project is not None:
+        edit(project)
+    else:
+        edit_project(project_key, edit)
     return output
 
 
+SIM_CACHE_INDEX = 'simcache::index' # Sorted set of the keys of cached simulations, scored by when they were last used
+
+def simulation_key(proj, *inputs):
+    '''
+    Return the key that the results of a simulation are cached under: a hash of the inputs
+    to the simulation (e.g. the parset, progset and program instructions), together with
+    the framework and settings of the project and the version of Atomica.
+    '''
+    sha = hashlib.sha256()
+    for obj in (at.__version__, proj.framework, proj.settings) + inputs:
+        sha.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    return 'simcache::' + sha.hexdigest()
+
+
+def load_simulation(key):
+    ''' Return the cached results of a simulation, or None if they aren't cached, marking them as recently used '''
+    if not int(get_setting('SIM_CACHE_SIZE', 0)):
+        return None
+    raw = datastore.redis.get(key)
+    if raw is None:
+        return None
+    try:
+        results = decode_blob(raw)
+    except Exception as E:
+        print('Warning: could not load cached simulation %s (%s)' % (key, str(E)))
+        return None
+    pipe = datastore.redis.pipeline(transaction=False)
+    pipe.expire(key, int(3600*float(get_setting('SIM_CACHE_TTL', 24))))
+    pipe.zadd(SIM_CACHE_INDEX, {key:time.time()})
+    pipe.execute()
+    return results
+
+
+def save_simulation(key, results):
+    '''
+    Cache the results of a simulation, then drop the least recently used simulations if
+    there are more than SIM_CACHE_SIZE. Simulations that haven't been used for SIM_CACHE_TTL
+    hours have already been expired by Redis.
+    '''
+    size = int(get_setting('SIM_CACHE_SIZE', 0))
+    if not size:
+        return None
+    ttl = int(3600*float(get_setting('SIM_CACHE_TTL', 24)))
+    now = time.time()
+    pipe = datastore.redis.pipeline(transaction=True)
+    pipe.set(key, encode_blob(results), ex=ttl)
+    pipe.zadd(SIM_CACHE_INDEX, {key:now})
+    pipe.zremrangebyscore(SIM_CACHE_INDEX, '-inf', now-ttl)
+    pipe.zcard(SIM_CACHE_INDEX)
+    excess = pipe.execute()[-1] - size
+    if excess > 0:
+        oldest = datastore.redis.zrange(SIM_CACHE_INDEX, 0, excess-1)
+        pipe = datastore.redis.pipeline(transaction=True)
+        pipe.delete(*oldest)
+        pipe.zrem(SIM_CACHE_INDEX, *oldest)
+        pipe.execute()
+    return key
+
+
+def cached_simulation(key, run):
+    '''
+    Return the results of a simulation, and whether they came from the cache: the cached
+    results for the key from simulation_key() if there are any, otherwise the output of
+    run(), which is then cached.
+    '''
+    results = load_simulation(key)
+    if results is not None:
+        print('Using cached simulation %s' % key)
+        return results, True
+    results = run()
+    try:
+        save_simulation(key, results)
+    except Exception as E:
+        print('Warning: could not cache simulation %s (%s)' % (key, str(E)))
+    return results, False
+
+
 
 
 
@@ -450,12 +1818,61 @@ def del_result(result_key, project_key, die=None):
 def jsonify_project(project_id, verbose=False):
     ''' Return the project json, given the Project UID. '''
     proj = load_project(project_id)  # Load the project record matching the UID of the project passed in.
+    json = project_summary(proj, update_string=project_update_string(proj))
+    if verbose: sc.pp(json)
+    return json
+
+
+def project_update_string(proj):
+    ''' Describe the update a project needs, using the versions recorded when it was migrated '''
     if proj._update_required:
-        orig_proj = load_project(project_id, safe_migration=True)
-        update_string = 'Update from %s to %s, results may change' % (orig_proj.version, proj.version)
+        migration = getattr(proj, 'migration', None) or {}
+        update_string = 'Update from %s to %s, results may change' % (migration.get('source', 'an older version'), migration.get('target', proj.version))
     else:
         update_string = ''
+    return update_string
+
+
+def summaries_for_save(keys, projects):
+    '''
+    Return the summary records to store when saving projects, or None for projects that
+    don't belong to a user yet. For lazily loaded projects whose framework, data or
+    program sets haven't been loaded -- and so can't have changed -- the fields
+    derived from them are copied from the existing summary rather than loading them.
+    '''
+    summaries = [None]*len(projects)
+    partial = [i for i,proj in enumerate(projects) if isinstance(proj, LazyProject) and proj._component_source == keys[i]
+               and any(name not in proj.__dict__ for name in ['framework', 'data', 'progsets'])]
+    for i,summary in zip(partial, load_project_summaries([keys[i] for i in partial])):
+        if summary is not None:
+            summary.update(project_shell_summary(projects[i]))
+            summaries[i] = summary
+    for i,proj in enumerate(projects):
+        if summaries[i] is None and hasattr(proj, 'webapp'): # Projects that haven't been through save_new_project() don't belong to a user yet
+            summaries[i] = project_summary(proj)
+    return summaries
+
+
+def project_shell_summary(proj, update_string=''):
+    ''' Return the fields of the project summary that don't depend on the framework, data or program sets '''
+    json = sc.odict({
+        'id': str(proj.uid),
+        'name': proj.name,
+        'username': proj.webapp.username,
+        'creationTime': proj.created,
+        'updatedTime': proj.modified,
+        'sim_start': proj.settings.sim_start,
+        'sim_end': proj.settings.sim_end,
+        'n_results': len(proj.results),
+        'n_tasks': len(proj.webapp.tasks),
+        'updateRequired': proj._update_required,
+        'updateString': update_string
+    })
+    return json
+
 
+def project_summary(proj, update_string=''):
+    ''' Return the fields of a project shown in the project list '''
     try:
         framework_name = proj.framework.name
     except:
@@ -489,18 +1906,25 @@ def jsonify_project(project_id, verbose=False):
         'updateRequired': proj._update_required,
         'updateString': update_string
     })
-    if verbose: sc.pp(json)
     return json
 
 
 @RPC()
 def jsonify_projects(username, verbose=False) -> list:
-    ''' Return project jsons for all projects the user has to the client. '''
+    '''
+    Return project jsons for all projects the user has to the client.
+
+    The jsons are read from the project summary records in a single request. Projects
+    without an up-to-date summary are loaded in full, and their summary is written back.
+    '''
     output = []
     user = get_user(username)
-    for project_key in user.projects:
+    summaries = load_project_summaries(user.projects)
+    for project_key,json in zip(user.projects, summaries):
         try:
-            json = jsonify_project(project_key)
+            if json is None:
+                json = jsonify_project(project_key)
+                save_project_summary(project_key, json)
             output.append(json)
         except Exception as E:
             print('Project load failed, skipping: %s' % str(E))
@@ -511,9 +1935,9 @@ def jsonify_projects(username, verbose=False) -> list:
 @RPC()
 def rename_project(project_id, new_name):
     ''' Given the passed in project json, update the underlying project accordingly. '''
-    proj = load_project(project_id) # Load the project corresponding with this json.
-    proj.name = new_name # Use the json to set the actual project.
-    save_project(proj) # Save the changed project to the DataStore.
+    def edit(proj):
+        proj.name = new_name # Use the json to set the actual project.
+    edit_project(project_id, edit) # Save the changed project to the DataStore, retrying if it's saved by another request in the meantime
     return None
 
 
@@ -532,7 +1956,7 @@ def add_demo_project(username, model, tool):
     """
 
     if tool == 'tb':
-        proj = at.Project(framework=ROOTDIR+'optima_tb_framework.xlsx',databook=ROOTDIR+'optima_tb_databook.xlsx', sim_dt=0.5, do_run=False)
+        proj = at.Project(framework=get_tb_framework(),databook=ROOTDIR+'optima_tb_databook.xlsx', sim_dt=0.5, do_run=False)
         proj.load_progbook(ROOTDIR+'optima_tb_progbook.xlsx')
         at.make_demo_scenarios(proj)  # Add example scenarios
     else:
@@ -567,7 +1991,7 @@ def create_new_project(username, new_project_json, tool=None):
     if tool is None or tool == 'cascade': # Optionally select by tool rather than frame
         frame = load_framework(framework_id, die=True) # Get the Framework object for the framework to be copied.
     elif tool == 'tb': # Or get a pre-existing one by the tool name
-        frame = at.ProjectFramework(ROOTDIR+'optima_tb_framework.xlsx')
+        frame = get_tb_framework()
 
     proj = at.Project(framework=frame, name=proj_name, sim_dt=sim_dt) # Create the project, loading in the desired spreadsheets.
 
@@ -653,6 +2077,7 @@ def download_project(project_id):
     file, minus results, and pass the full path of this file back.
     '''
     proj = load_project(project_id, die=True, safe_migration=True) # Load the project with the matching UID.
+    materialize_project(proj) # So it can be loaded outside the webapp
 
     # For convenience, construct Optimizations for each FE optimization when downloading to facilitate BE usage
     for json in proj.optim_jsons:
@@ -673,9 +2098,8 @@ def download_projects(project_keys, username):
     '''
     basedir = get_path('', username) # Use the downloads directory to put the file in.
     project_paths = []
-    for project_key in project_keys:
-        proj = load_project(project_key, safe_migration=True)
-        project_path = proj.save(folder=basedir)
+    for proj in load_projects(project_keys, die=True, safe_migration=True):
+        project_path = materialize_project(proj).save(folder=basedir)
         project_paths.append(project_path)
     zip_fname = 'Projects %s.zip' % sc.getdate() # Make the zip file name and the full server file path version of the same..
     server_zip_fname = get_path(zip_fname, username)
@@ -747,6 +2171,13 @@ def upload_progbook(progbook_filename, project_id):
 def jsonify_framework(framework_id, verbose=False):
     ''' Return the framework json, given the framework UID. '''
     frame = load_framework(framework_id) # Load the framework record matching the UID of the framework passed in.
+    json = framework_summary(frame)
+    if verbose: sc.pp(json)
+    return json
+
+
+def framework_summary(frame):
+    ''' Return the fields of a framework shown in the framework list '''
     json = {
         'id':           str(frame.uid),
         'name':         frame.name,
@@ -754,7 +2185,6 @@ def jsonify_framework(framework_id, verbose=False):
         'creationTime': frame.created,
         'updatedTime':  frame.modified,
     }
-    if verbose: sc.pp(json)
     return json
 
 
@@ -763,14 +2193,18 @@ def jsonify_frameworks(username, verbose=True):
     ''' Return framework jsons for all frameworks the user has to the client. '''
     output = []
     user = get_user(username)
-    for framework_key in user.frameworks:
+    frames = load_frameworks(user.frameworks)
+    failed = []
+    for framework_key,frame in zip(user.frameworks, frames):
         try:
-            json = jsonify_framework(framework_key)
+            json = framework_summary(frame)
+            output.append(json)
         except Exception as E:
             print('Framework load failed, removing: %s' % str(E))
-            user.projects.remove(framework_key)
-            datastore.saveuser(user)
-        output.append(json)
+            failed.append(framework_key)
+    if failed:
+        user.frameworks = [key for key in user.frameworks if key not in failed]
+        datastore.saveuser(user)
     if verbose: sc.pp(output)
     return output
 
@@ -872,13 +2306,142 @@ def upload_new_frameworkbook(filename, username):
 ### Calibration RPCs
 ##################################################################################
 
+class CalibrationSession(sc.prettyobj):
+    '''
+    A project held in memory while it's being calibrated interactively
+
+    While a session is open, get_y_factors(), set_y_factors() and manual_calibration()
+    use the project in memory rather than loading it from the datastore and saving it
+    again every time. Edits are saved by save_calibration_session(), when the session is
+    closed, or when it hasn't been used for CALIBRATION_SESSION_TIMEOUT minutes.
+    '''
+
+    def __init__(self, project):
+        self.project = project
+        self.parsetnames = set() # Parsets with y-factors edited since the last save
+        self.resultkeys = {} # Results cached since the last save
+        self.lock = threading.Lock() # Held while simulating or saving
+        self.used = time.time()
+        return None
+
+
+calibration_sessions = {} # Open calibration sessions in this process, by project key
+calibration_sessions_lock = threading.Lock()
+session_reaper = None # Thread started by open_calibration_session() that expires sessions
+
+
+def get_calibration_session(project_id):
+    ''' Return the open calibration session of a project, or None, and mark it as used '''
+    key = datastore.getkey(key=project_id, objtype='project')
+    with calibration_sessions_lock:
+        session = calibration_sessions.get(key)
+    if session is not None:
+        session.used = time.time()
+    return session
+
+
+def save_session_project(session):
+    '''
+    Save the edits made during a calibration session. If the project has been saved by
+    another request in the meantime, the edited parsets and cached results are copied
+    onto the latest version instead.
+    '''
+    with session.lock:
+        if not session.parsetnames and not session.resultkeys:
+            return None
+        try:
+            save_project(session.project)
+        except ProjectConflictError:
+            parsets = {name:session.project.parsets[name] for name in session.parsetnames}
+            resultkeys = dict(session.resultkeys)
+            def edit(proj):
+                for name,parset in parsets.items():
+                    if name in proj.parsets:
+                        proj.parsets[name] = parset
+                    else: # Renamed or deleted by the other request
+                        print('Warning: not saving the y-factors of parset "%s", since it no longer exists' % name)
+                proj.results.update(resultkeys)
+            edit_project(session.project.uid, edit)
+            session.project = load_project(session.project.uid, die=True)
+        session.parsetnames.clear()
+        session.resultkeys.clear()
+    return None
+
+
+def expire_calibration_sessions(expire_all=False):
+    ''' Save and close the calibration sessions that haven't been used for CALIBRATION_SESSION_TIMEOUT minutes '''
+    timeout = 60*float(get_setting('CALIBRATION_SESSION_TIMEOUT', 30))
+    now = time.time()
+    with calibration_sessions_lock:
+        expired = [key for key,session in calibration_sessions.items() if expire_all or now - session.used > timeout]
+        sessions = [calibration_sessions.pop(key) for key in expired]
+    for key,session in zip(expired, sessions):
+        try:
+            save_session_project(session)
+            print('Closed calibration session for %s' % key)
+        except Exception as E:
+            print('Warning: could not save calibration session for %s (%s)' % (key, str(E)))
+    return len(sessions)
+
+
+def run_session_reaper():
+    ''' Expire calibration sessions once a minute, in a background thread '''
+    while True:
+        time.sleep(60)
+        expire_calibration_sessions()
+
+
+@RPC()
+def open_calibration_session(project_id):
+    '''
+    Keep a project in memory in this process while it's being calibrated, until
+    close_calibration_session() is called or it's left unused for too long. Opening a
+    session that's already open just marks it as used.
+    '''
+    global session_reaper
+    key = datastore.getkey(key=project_id, objtype='project')
+    if get_calibration_session(key) is None:
+        session = CalibrationSession(load_project(key, die=True))
+        with calibration_sessions_lock:
+            calibration_sessions.setdefault(key, session)
+            if session_reaper is None:
+                session_reaper = threading.Thread(target=run_session_reaper, daemon=True)
+                session_reaper.start()
+                atexit.register(expire_calibration_sessions, expire_all=True)
+    print('Opened calibration session for %s' % key)
+    return {'timeout':float(get_setting('CALIBRATION_SESSION_TIMEOUT', 30))}
+
+
+@RPC()
+def save_calibration_session(project_id):
+    ''' Save the edits made in a calibration session, leaving it open '''
+    session = get_calibration_session(project_id)
+    if session is None:
+        return {'error': 'The calibration session has expired'}
+    save_session_project(session)
+    return None
+
+
+@RPC()
+def close_calibration_session(project_id, save=True):
+    ''' Close a calibration session, saving its edits unless save is False '''
+    key = datastore.getkey(key=project_id, objtype='project')
+    with calibration_sessions_lock:
+        session = calibration_sessions.pop(key, None)
+    if session is not None and save:
+        save_session_project(session)
+    print('Closed calibration session for %s' % key)
+    return None
+
+
 @RPC()
 def get_y_factors(project_id, parsetname=-1, tool=None, verbose=False):
     print('Getting y factors for parset %s...' % parsetname)
     print('Warning, year hard coded!')
     TEMP_YEAR = 2018 # WARNING, hard-coded!
     y_factors = []
-    proj = load_project(project_id, die=True)
+    session = get_calibration_session(project_id)
+    proj = session.project if session is not None else load_project(project_id, die=True)
     parset = proj.parsets[parsetname]
     count = -1
     for par in parset.pars.values():
@@ -923,55 +2486,60 @@ def set_y_factors(project_id, parsetname=-1, parlist=None, tool=None, verbose=Fa
     print('Setting y factors for parset %s...' % parsetname)
     print('Warning, year hard coded!')
     TEMP_YEAR = 2018 # WARNING, hard-coded!
-    proj = load_project(project_id, die=True)
-    parset = proj.parsets[parsetname]
-    for newpar in parlist:
-        parname = newpar['parname']
-        this_par = parset.pars[parname]
-        this_par.meta_y_factor = to_float(newpar['meta_y_factor'])
-        if verbose: print('Metaparameter %10s: %s' % (parname, this_par.meta_y_factor))
-        for newpoppar in newpar['pop_y_factors']:
-            popname = newpoppar['popname']
-            if tool == 'cascade':
-                this_par.y_factor[popname] = to_float(newpoppar['dispvalue'])
-            else:
-                # Try to get interpolated value
-                if not this_par.has_values(popname):
-                    interp_val = 1.0
+    session = get_calibration_session(project_id)
+    with session.lock if session is not None else contextlib.nullcontext(): # So the session isn't saved halfway through the edit
+        proj = session.project if session is not None else load_project(project_id, die=True)
+        parset = proj.parsets[parsetname]
+        for newpar in parlist:
+            parname = newpar['parname']
+            this_par = parset.pars[parname]
+            this_par.meta_y_factor = to_float(newpar['meta_y_factor'])
+            if verbose: print('Metaparameter %10s: %s' % (parname, this_par.meta_y_factor))
+            for newpoppar in newpar['pop_y_factors']:
+                popname = newpoppar['popname']
+                if tool == 'cascade':
+                    this_par.y_factor[popname] = to_float(newpoppar['dispvalue'])
                 else:
-                    try:
-                        interp_val = this_par.interpolate([TEMP_YEAR],popname)[0]
-                        if not np.isfinite(interp_val):
-                            print('NUMBER WARNING, value for %s %s is not finite' % (parname, popname))
+                    # Try to get interpolated value
+                    if not this_par.has_values(popname):
+                        interp_val = 1.0
+                    else:
+                        try:
+                            interp_val = this_par.interpolate([TEMP_YEAR],popname)[0]
+                            if not np.isfinite(interp_val):
+                                print('NUMBER WARNING, value for %s %s is not finite' % (parname, popname))
+                                interp_val = 1
+                            if sc.approx(interp_val, 0):
+                                interp_val = 0.0
+                        except Exception as E:
+                            print('NUMBER WARNING, value for %s %s is not convertible: %s' % (parname, popname, str(E)))
                             interp_val = 1
-                        if sc.approx(interp_val, 0):
-                            interp_val = 0.0
-                    except Exception as E:
-                        print('NUMBER WARNING, value for %s %s is not convertible: %s' % (parname, popname, str(E)))
-                        interp_val = 1
-
-                # Convert the value
-                dispvalue     = to_float(newpoppar['dispvalue'])
-                origdispvalue = to_float(newpoppar['origdispvalue'])
-                changed = (dispvalue != origdispvalue)
-                if changed:
-                    print('Parameter %10s %10s updated: %s -> %s' % (parname, popname, origdispvalue, dispvalue))
-                else:
-                    if verbose: print('Note: parameter %10s %10s stayed the same! %s -> %s' % (parname, popname, origdispvalue, dispvalue))
-                orig_y_factor = this_par.y_factor[popname]
-                if not sc.approx(origdispvalue, 0):
-                    y_factor_change = dispvalue/origdispvalue
-                    y_factor        = orig_y_factor*y_factor_change
-                elif not sc.approx(interp_val, 0):
-                    y_factor = dispvalue/(1e-6+interp_val)
-                else:
-                    if changed: print('NUMBER WARNING, everything is 0 for %s %s: %s %s %s %s' % (parname, popname, origdispvalue, dispvalue, interp_val, orig_y_factor))
-                    y_factor = orig_y_factor
-                this_par.y_factor[popname] = y_factor
+
+                    # Convert the value
+                    dispvalue     = to_float(newpoppar['dispvalue'])
+                    origdispvalue = to_float(newpoppar['origdispvalue'])
+                    changed = (dispvalue != origdispvalue)
+                    if changed:
+                        print('Parameter %10s %10s updated: %s -> %s' % (parname, popname, origdispvalue, dispvalue))
+                    else:
+                        if verbose: print('Note: parameter %10s %10s stayed the same! %s -> %s' % (parname, popname, origdispvalue, dispvalue))
+                    orig_y_factor = this_par.y_factor[popname]
+                    if not sc.approx(origdispvalue, 0):
+                        y_factor_change = dispvalue/origdispvalue
+                        y_factor        = orig_y_factor*y_factor_change
+                    elif not sc.approx(interp_val, 0):
+                        y_factor = dispvalue/(1e-6+interp_val)
+                    else:
+                        if changed: print('NUMBER WARNING, everything is 0 for %s %s: %s %s %s %s' % (parname, popname, origdispvalue, dispvalue, interp_val, orig_y_factor))
+                        y_factor = orig_y_factor
+                    this_par.y_factor[popname] = y_factor
+        if session is not None: # Saved with the session
+            session.parsetnames.add(parset.name)
     if verbose: sc.pp(parlist)
     print('Setting %s y-factors for %s' % (len(parlist), parsetname))
-    print('Saving project...')
-    save_project(proj)
+    if session is None:
+        print('Saving project...')
+        save_project(proj)
     return None
 
 
@@ -1002,39 +2570,37 @@ def get_parset_names(project_id):
 @RPC()
 def rename_parset(project_id, parsetname=None, new_name=None):
     print('Renaming parset from %s to %s...' % (parsetname, new_name))
-    proj = load_project(project_id, die=True)
-    proj.parsets.rename(parsetname, new_name)
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        proj.parsets.rename(parsetname, new_name)
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return None
 
 
 @RPC()
 def copy_parset(project_id, parsetname=None):
     print('Copying parset %s...' % parsetname)
-    proj = load_project(project_id, die=True)
-    print('Number of parsets before copy: %s' % len(proj.parsets))
-    new_name = sc.uniquename(parsetname, namelist=proj.parsets.keys())
-    print('Old name: %s; new name: %s' % (parsetname, new_name))
-    proj.parsets[new_name] = sc.dcp(proj.parsets[parsetname])
-    print('Number of parsets after copy: %s' % len(proj.parsets))
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        print('Number of parsets before copy: %s' % len(proj.parsets))
+        new_name = sc.uniquename(parsetname, namelist=proj.parsets.keys())
+        print('Old name: %s; new name: %s' % (parsetname, new_name))
+        proj.parsets[new_name] = sc.dcp(proj.parsets[parsetname])
+        print('Number of parsets after copy: %s' % len(proj.parsets))
+        return new_name
+    new_name = edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return new_name
 
 
 @RPC()
 def delete_parset(project_id, parsetname=None):
     print('Deleting parset %s...' % parsetname)
-    proj = load_project(project_id, die=True)
-    print('Number of parsets before delete: %s' % len(proj.parsets))
-    if len(proj.parsets)>1:
-        proj.parsets.pop(parsetname)
-    else:
-        raise Exception('Cannot delete last parameter set')
-    print('Number of parsets after delete: %s' % len(proj.parsets))
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        print('Number of parsets before delete: %s' % len(proj.parsets))
+        if len(proj.parsets)>1:
+            proj.parsets.pop(parsetname)
+        else:
+            raise Exception('Cannot delete last parameter set')
+        print('Number of parsets after delete: %s' % len(proj.parsets))
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return None
 
 
@@ -1084,39 +2650,36 @@ def get_progset_names(project_id):
 @RPC()
 def rename_progset(project_id, progsetname=None, new_name=None):
     print('Renaming progset from %s to %s...' % (progsetname, new_name))
-    proj = load_project(project_id, die=True)
-    proj.progsets.rename(progsetname, new_name)
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        proj.progsets.rename(progsetname, new_name)
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return None
 
 
 @RPC()
 def copy_progset(project_id, progsetname=None):
     print('Copying progset %s...' % progsetname)
-    proj = load_project(project_id, die=True)
-    print('Number of progsets before copy: %s' % len(proj.progsets))
-    new_name = sc.uniquename(progsetname, namelist=proj.progsets.keys())
-    print('Old name: %s; new name: %s' % (progsetname, new_name))
-    proj.progsets[new_name] = sc.dcp(proj.progsets[progsetname])
-    print('Number of progsets after copy: %s' % len(proj.progsets))
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        print('Number of progsets before copy: %s' % len(proj.progsets))
+        new_name = sc.uniquename(progsetname, namelist=proj.progsets.keys())
+        print('Old name: %s; new name: %s' % (progsetname, new_name))
+        proj.progsets[new_name] = sc.dcp(proj.progsets[progsetname])
+        print('Number of progsets after copy: %s' % len(proj.progsets))
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return None
 
 
 @RPC()
 def delete_progset(project_id, progsetname=None):
     print('Deleting progset %s...' % progsetname)
-    proj = load_project(project_id, die=True)
-    print('Number of progsets before delete: %s' % len(proj.progsets))
-    if len(proj.progsets)>1:
-        proj.progsets.pop(progsetname)
-    else:
-        raise Exception('Cannot delete last program set')
-    print('Number of progsets after delete: %s' % len(proj.progsets))
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        print('Number of progsets before delete: %s' % len(proj.progsets))
+        if len(proj.progsets)>1:
+            proj.progsets.pop(progsetname)
+        else:
+            raise Exception('Cannot delete last program set')
+        print('Number of progsets after delete: %s' % len(proj.progsets))
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return None
 
 @RPC()
@@ -1142,7 +2705,7 @@ def get_tb_default_progset(fulloutput=False, verbose=True):
 
     # Get programs
     if verbose: print('get_default_programs(): Creating framework...')
-    F = at.ProjectFramework(ROOTDIR+"optima_tb_framework.xlsx")
+    F = get_tb_framework()
     if verbose: print('get_default_programs(): Creating dict...')
     default_pops = sc.odict() # TODO - read in the pops from the defaults file instead of hard-coding them here
     for key in ['^0.*', '.*HIV.*', '.*[pP]rison.*', '^[^0](?!HIV)(?![pP]rison).*']:
@@ -1341,7 +2904,7 @@ def savefigs(allfigs, username, die=False):
     filepath = sc.savefigs(allfigs, filetype='singlepdf', filename='Figures.pdf', folder=get_path('', username=username))
     figblob = sc.Blobject(filename=filepath)
     figkey = 'figures::'+username
-    datastore.saveblob(key=figkey, obj=figblob)
+    datastore.redis.set(figkey, encode_blob(figblob))
     return filepath
 
 
@@ -1350,7 +2913,10 @@ def download_graphs(username):
     ''' Download figures, first loading from database and then saving '''
     file_name = 'Figures.pdf' # Create a filename containing the framework name followed by a .frw suffix.
     full_file_name = get_path(file_name, username=username) # Generate the full file name with path.
-    figblob = datastore.loadblob(key='figures::'+username)
+    rawblob = datastore.redis.get('figures::'+username)
+    if rawblob is None:
+        raise Exception('No figures have been saved for user "%s"' % username)
+    figblob = decode_blob(rawblob)
     figblob.save(full_file_name)
     return full_file_name
 
@@ -1369,6 +2935,7 @@ def get_atomica_plots(proj, results=None, plot_names=None, plot_options=None, po
     plot_names = sc.promotetolist(plot_names)
     if outputs is None:
         outputs = [{plot_name: supported_plots[plot_name]} for plot_name in plot_names if plot_name in supported_plots] # Warning, implicit dict definition
+    load_result_variables(results, names=[list(output.values())[0] for output in outputs]) # Only load the variables being plotted
     allfigs = []
     alllegends = []
     allfigjsons = []
@@ -1511,10 +3078,12 @@ def make_plots(proj, results, tool=None, year=None, pops=None, plot_options=None
             append_plots(d, figs, legends)
 
         if showcoverageplots:
+            load_result_variables(results)
             d, figs, legends = get_coverage_plots(results=results)
             append_plots(d, figs, legends)
 
     if calibration and tool=='tb' and proj.data.pops[0]['type']=='ind': # Don't do advanced TB plots on scenarios, they are only expected to work with single results for now
+        load_result_variables(results)
         if show_tb_calibration:
             tb_output, tb_figs, tb_legends = tb_key_calibration_plots(proj, results, pops=pops)
             append_plots(tb_output, tb_figs, tb_legends)
@@ -1594,6 +3163,7 @@ def get_budget_plots(results, year):
     results = [x for x in results if not x.model.program_instructions.coverage] # Only include results that did NOT have coverage overwrites
     if not results:
         return output, figs, legends
+    load_result_variables(results, names=[]) # Spending doesn't depend on any model variables
 
     # Prepare data
     d = at.PlotData.programs(results, quantity='spending')
@@ -1663,6 +3233,7 @@ def get_cascade_plots(proj, results=None, pops=None, year=None, plot_budget=Fals
     years = sc.promotetolist(year)
     for y in range(len(years)):
         years[y] = float(years[y]) # Ensure it's a float
+    load_result_variables(results, names=list(proj.framework.cascades.values())) # Only load the variables in the cascade stages
 
     for cascade in proj.framework.cascades.keys():
         fig, table = at.plot_cascade(results, cascade=cascade, pops=pops, year=years, data=proj.data, show_table=False)
@@ -1762,22 +3333,101 @@ def get_json_cascade(results, data):
 @RPC()
 def manual_calibration(project_id, cache_id, parsetname=-1, plot_options=None, plotyear=None, pops=None, tool=None, dosave=True):
     print('Running "manual calibration"...')
-    proj = load_project(project_id, die=True)
-    result = proj.run_sim(parset=parsetname, store_results=False)
-    cache_result(proj, result, cache_id)
+    session = get_calibration_session(project_id)
+    proj = session.project if session is not None else load_project(project_id, die=True)
+    key = simulation_key(proj, proj.parsets[parsetname])
+    if session is not None: # Add the result to the project in memory, to be saved with the session
+        with session.lock:
+            result, cache_hit = cached_simulation(key, lambda: proj.run_sim(parset=parsetname, store_results=False))
+            proj.results[cache_id] = session.resultkeys[cache_id] = save_result(result, key=cache_id)
+    else:
+        result, cache_hit = cached_simulation(key, lambda: proj.run_sim(parset=parsetname, store_results=False))
+        cache_result(proj, result, cache_id)
     output = make_plots(proj, result, tool=tool, year=plotyear, pops=pops, plot_options=plot_options, dosave=dosave, calibration=True)
+    output['cache_hit'] = cache_hit
     return output
 
 
+class CalibrationProgress(sc.prettyobj):
+    '''
+    Wrapper for the run_sim() method of a project being calibrated, which the calibration
+    calls once for every evaluation of its objective. It reports the number of evaluations
+    and the elapsed time to a callback at most once every interval seconds.
+    '''
+
+    def __init__(self, run_sim, callback, max_time=None, interval=1.0):
+        self.run_sim = run_sim
+        self.callback = callback
+        self.max_time = max_time
+        self.interval = interval
+        self.evaluations = 0
+        self.start = time.time()
+        self.reported = 0
+        return None
+
+    def __call__(self, *args, **kwargs):
+        output = self.run_sim(*args, **kwargs)
+        self.evaluations += 1
+        if time.time() - self.reported >= self.interval:
+            self.report()
+        return output
+
+    def report(self):
+        self.reported = time.time()
+        self.callback(evaluations=self.evaluations, elapsed=self.reported-self.start, max_time=self.max_time)
+        return None
+
+
+def run_calibration(proj, parsetname=-1, max_time=20, tool=None, progress=None):
+    '''
+    Automatically calibrate a parset of a project, and return the result of running it.
+    If a progress function is supplied, it's called with the number of evaluations, the
+    elapsed time and the maximum time as the calibration goes.
+    '''
+    if progress is not None: # Only this project object is changed, so nothing else running in the process is affected
+        proj.run_sim = CalibrationProgress(proj.run_sim, progress, max_time=float(max_time))
+    try:
+        if tool=='tb':
+            proj.calibrate(parset=parsetname, max_time=float(max_time), adjustables=['inf_sus','l_dep', 'p_branch'], measurables=['ac_inf', 'lt_inf']) # WARNING, incomplete
+        else:
+            proj.calibrate(parset=parsetname, max_time=float(max_time)) # WARNING, add kwargs!
+    finally:
+        tracker = proj.__dict__.pop('run_sim', None)
+    if tracker is not None:
+        tracker.report()
+    result = proj.run_sim(parset=parsetname, store_results=False)
+    return result
+
+
+def report_progress(**meta):
+    ''' Record the progress of the Celery task this is called from in its task metadata, see get_task_progress() '''
+    task = celery.current_task
+    if task is not None and task.request.id is not None:
+        task.update_state(state='PROGRESS', meta=meta)
+    return None
+
+
+@RPC()
+def get_task_progress(task_id):
+    ''' Return the progress reported by a running task with report_progress(), or None if it hasn't reported any '''
+    try:
+        task_record = datastore.loadtask(task_id)
+        raw = datastore.redis.get('celery-task-meta-%s' % task_record.result_id)
+    except Exception as E:
+        return {'error': 'Could not find task %s (%s)' % (task_id, str(E))}
+    if raw is None:
+        return None
+    meta = sc.loadjson(string=raw.decode())
+    if meta.get('status') != 'PROGRESS':
+        return None
+    return meta['result']
+
+
 @RPC()
 def automatic_calibration(project_id, cache_id, parsetname=-1, max_time=20, saveresults=True, plot_options=None, tool=None, plotyear=None, pops=None, dosave=True):
     print('Running automatic calibration for parset %s...' % parsetname)
     proj = load_project(project_id, die=True)
-    if tool=='tb':
-        proj.calibrate(parset=parsetname, max_time=float(max_time), adjustables=['inf_sus','l_dep', 'p_branch'], measurables=['ac_inf', 'lt_inf']) # WARNING, incomplete
-    else:
-        proj.calibrate(parset=parsetname, max_time=float(max_time)) # WARNING, add kwargs!
-    result = proj.run_sim(parset=parsetname, store_results=False)
+    result = run_calibration(proj, parsetname=parsetname, max_time=max_time, tool=tool)
     cache_result(proj, result, cache_id)
     output = make_plots(proj, result, tool=tool, year=plotyear, pops=pops, plot_options=plot_options, dosave=dosave, calibration=True)
     return output
@@ -2074,16 +3724,15 @@ def get_scen_info(project_id, verbose=False):
 @RPC()
 def set_scen_info(project_id, scenario_jsons, verbose=True):
     print('Setting scenario info...')
-    proj = load_project(project_id, die=True)
-    proj.scens.clear()
-    for j,js_scen in enumerate(scenario_jsons):
-        print('Setting scenario %s of %s...' % (j+1, len(scenario_jsons)))
-        proj.scens.append(js_to_py_scen(js_scen))
-        if verbose:
-            print('Python scenario info for scenario %s:' % (j+1))
-            sc.pp(proj.scens[-1])
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        proj.scens.clear()
+        for j,js_scen in enumerate(scenario_jsons):
+            print('Setting scenario %s of %s...' % (j+1, len(scenario_jsons)))
+            proj.scens.append(js_to_py_scen(js_scen))
+            if verbose:
+                print('Python scenario info for scenario %s:' % (j+1))
+                sc.pp(proj.scens[-1])
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
     return None
 
 
@@ -2249,18 +3898,181 @@ def scen_reset_values(js_scen:dict, project_id, overwrite:bool =True) -> dict:
     return js_scen
 
 
+process_pools = {} # Created by get_process_pool()
+pool_lock = threading.Lock() # The web server handles requests in threads
+
+def get_process_pool(name, processes, **kwargs):
+    '''
+    Return the pool of processes with the given name, creating it the first time, or None
+    if there are to be 0 or 1 processes. The processes are started fresh rather than
+    forked, since the web server process has threads running. Keyword arguments are
+    passed to the ProcessPoolExecutor.
+    '''
+    if processes <= 1:
+        return None
+    with pool_lock:
+        if name not in process_pools:
+            process_pools[name] = concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'), **kwargs)
+        return process_pools[name]
+
+
+def reset_process_pool(pool):
+    ''' Discard a pool that's broken because one of its processes died, so that get_process_pool() creates a new one '''
+    with pool_lock:
+        for name in [name for name,existing in process_pools.items() if existing is pool]:
+            del process_pools[name]
+    pool.shutdown(wait=False)
+    return None
+
+
+def run_in_pool(get_pool, func, argslist):
+    '''
+    Run a function on each of a list of argument tuples in the pool returned by get_pool(),
+    and return the outputs in the same order. If one of the processes dies, e.g. because
+    it ran out of memory, the pool is replaced and everything is run again, once.
+    '''
+    for attempt in range(2):
+        pool = get_pool()
+        try:
+            futures = [pool.submit(func, *args) for args in argslist]
+            return [future.result() for future in futures] # In the original order, whatever order they finish in
+        except concurrent.futures.process.BrokenProcessPool as E:
+            reset_process_pool(pool)
+            if attempt:
+                raise E
+            print('Warning: a process of the pool died, so running again in a new pool: %s' % str(E))
+
+
+def get_scenario_pool():
+    ''' Return the pool of processes used to run scenarios in parallel, or None if SCENARIO_PROCESSES in the config module is 0 or 1 '''
+    output = get_process_pool('scenarios', int(get_setting('SCENARIO_PROCESSES', 1)))
+    return output
+
+
+def run_scenario_worker(projstr, index):
+    ''' Run one of the active scenarios of a pickled project, in a process of the scenario pool '''
+    proj = pickle.loads(projstr)
+    scen = [scen for scen in proj.scens.values() if scen.active][index]
+    result = scen.run(project=proj, store_results=False)
+    return result
+
+
+def run_pooled_scenarios(proj):
+    ''' Run the active scenarios of a project in the scenario pool, pickling the project only once '''
+    n_scens = len([scen for scen in proj.scens.values() if scen.active])
+    projstr = pickle.dumps(materialize_project(proj), protocol=pickle.HIGHEST_PROTOCOL)
+    results = run_in_pool(get_scenario_pool, run_scenario_worker, [(projstr, index) for index in range(n_scens)])
+    return results
+
+
+def scenario_branch_year(proj, scens):
+    '''
+    Return the year at which a set of scenarios diverge, if they're budget or coverage
+    scenarios that share a parset and program start year, since until then they're the
+    same simulation. Returns None if they can't share a simulation, e.g. for parameter
+    scenarios, which can overwrite the parset at any time, or if this version of Atomica
+    can't start a simulation from the state of a previous one.
+    '''
+    if not get_setting('SCENARIO_BRANCHING', False) or not hasattr(at, 'Initialization'):
+        return None
+    if len(scens) <= 1 or not all(isinstance(scen, (at.BudgetScenario, at.CoverageScenario)) for scen in scens):
+        return None
+    parsetnames = set(scen.parsetname for scen in scens)
+    years = set(scen.start_year for scen in scens)
+    if len(parsetnames) != 1 or len(years) != 1:
+        return None
+    parsetname = parsetnames.pop()
+    year = years.pop()
+    if parsetname not in proj.parsets or year is None:
+        return None
+    if getattr(proj.parsets[parsetname], 'initialization', None) is not None: # Already starts from a previous simulation
+        return None
+    if not proj.settings.sim_start < year < proj.settings.sim_end:
+        return None
+    return float(year)
+
+
+def splice_result(prefix, result, year):
+    '''
+    Join the years before the branch year of the shared simulation onto a Result that was
+    simulated from that year, in place. Every array of every model variable that runs over
+    the simulation years is extended, as is the time vector of the model.
+    '''
+    n_prefix = int(np.sum(prefix.model.t < year - 1e-6))
+    n_result = len(result.model.t)
+    prefixvars = dict(result_variables(prefix))
+    for location,var in result_variables(result):
+        if location not in prefixvars:
+            errormsg = 'Result "%s" does not have the same model variables as the shared simulation' % result.name
+            raise Exception(errormsg)
+        prefixvar = prefixvars[location]
+        for attr,val in list(var.__dict__.items()):
+            prefixval = prefixvar.__dict__.get(attr)
+            if isinstance(val, np.ndarray) and isinstance(prefixval, np.ndarray) and val.ndim and val.shape[0] == n_result and prefixval.shape[1:] == val.shape[1:]:
+                var.__dict__[attr] = np.concatenate([prefixval[:n_prefix], val])
+    result.model.t = np.concatenate([prefix.model.t[:n_prefix], result.model.t])
+    return result
+
+
+def run_branched_scenarios(proj, scens, year, pooled=False):
+    '''
+    Run scenarios that diverge at the year returned by scenario_branch_year(): the years
+    before it are simulated once, and each scenario is simulated from the state of that
+    simulation in that year, and then joined onto it. The project isn't modified.
+    '''
+    parsetname = scens[0].parsetname
+    branched = pickle.loads(pickle.dumps(materialize_project(proj), protocol=pickle.HIGHEST_PROTOCOL)) # A copy to change the settings and parset of
+    settings = sc.dcp(branched.settings)
+    branched.settings.sim_end = year
+    prefix = branched.run_sim(parset=parsetname, store_results=False)
+    branched.settings.sim_end = settings.sim_end
+    branched.settings.sim_start = year
+    branched.parsets[parsetname].initialization = at.Initialization.from_result(prefix, parset=branched.parsets[parsetname], year=year)
+    if pooled:
+        results = run_pooled_scenarios(branched)
+    else:
+        results = [scen.run(project=branched, store_results=False) for scen in branched.scens.values() if scen.active]
+    for result in results:
+        splice_result(prefix, result, year)
+        result.model.settings = sc.dcp(settings)
+    return results
+
+
+def run_project_scenarios(proj):
+    '''
+    Run the active scenarios of a project, in parallel if there's a scenario pool, and
+    return the results in the same order as proj.run_scenarios(store_results=False).
+    Scenarios that only diverge at their program start year share the simulation of the
+    years before it.
+    '''
+    scens = [scen for scen in proj.scens.values() if scen.active]
+    pooled = get_scenario_pool() is not None
+    year = scenario_branch_year(proj, scens)
+    if year is not None:
+        try:
+            return run_branched_scenarios(proj, scens, year, pooled=pooled)
+        except concurrent.futures.process.BrokenProcessPool:
+            raise # Already run again by run_in_pool()
+        except Exception as E:
+            print('Warning: could not branch the scenarios at %s, so running them in full: %s' % (year, str(E)))
+    if not pooled or len(scens) <= 1:
+        return proj.run_scenarios(store_results=False)
+    return run_pooled_scenarios(proj)
+
+
 @RPC()
 def run_scenarios(project_id, cache_id, plot_options, saveresults=True, tool=None, plotyear=None, pops=None, dosave=True):
     print('Running scenarios...')
     proj = load_project(project_id, die=True)
     print(proj.settings.sim_start)
-    results = proj.run_scenarios(store_results=False)
-    if len(results) < 1:  # Fail if we have no results (user didn't pick a scenario)
+    scens = [scen for scen in proj.scens.values() if scen.active]
+    if len(scens) < 1:  # Fail if we have no results (user didn't pick a scenario)
         return {'error': 'No scenario selected'}
-    cache_result(proj, results, cache_id)
+    key = simulation_key(proj, scens, proj.parsets, proj.progsets)
+    results, cache_hit = cached_simulation(key, lambda: run_project_scenarios(proj))
+    cache_result(proj, results, cache_id) # Saves the project
     output = make_plots(proj, results, tool=tool, year=plotyear, pops=pops, plot_options=plot_options, dosave=dosave, calibration=False, plot_budget=True)
-    print('Saving project...')
-    save_project(proj)
+    output['cache_hit'] = cache_hit
     return output
 
 
@@ -2332,36 +4144,40 @@ def update_optim(project_id, json: dict, old_name:str = None) -> list:
     """
 
     print('Setting optimization info...')
-    proj = load_project(project_id, die=True)
-
-    # Double check no name collisions
-    if json['name'] != old_name:
-        for existing in proj.optim_jsons:
-            if existing['name'] == json['name']:
-                raise Exception('Another optimization with that name already exists')
-
-    for key in ['start_year', 'adjustment_year', 'end_year', 'budget_factor', 'maxtime']:
-        json[key] = to_float(json[key])  # Convert to a number
-    for objective in json['objective_weights'].keys():
-        json['objective_weights'][objective] = to_float(json['objective_weights'][objective], blank_ok=True)
-    for prog_name in json['prog_spending'].keys():
-        json['prog_spending'][prog_name]['min'] = to_float(json['prog_spending'][prog_name]['min'])
-        json['prog_spending'][prog_name]['max'] = to_float(json['prog_spending'][prog_name]['max'])
-
-    # If we are updating an existing optimization, then the old name (assigned when
-    # the modal was opened) will match one of the existing entries. Otherwise, it's a new one
-    if old_name:
-        for i in range(0,len(proj.optim_jsons)):
-            if proj.optim_jsons[i]['name'] == old_name:
-                proj.optim_jsons[i] = json
-                break
+    def edit(proj):
+
+        # Double check no name collisions
+        if json['name'] != old_name:
+            for existing in proj.optim_jsons:
+                if existing['name'] == json['name']:
+                    raise Exception('Another optimization with that name already exists')
+
+        for key in ['start_year', 'adjustment_year', 'end_year', 'budget_factor', 'maxtime']:
+            json[key] = to_float(json[key])  # Convert to a number
+        for objective in json['objective_weights'].keys():
+            json['objective_weights'][objective] = to_float(json['objective_weights'][objective], blank_ok=True)
+        for prog_name in json['prog_spending'].keys():
+            json['prog_spending'][prog_name]['min'] = to_float(json['prog_spending'][prog_name]['min'])
+            json['prog_spending'][prog_name]['max'] = to_float(json['prog_spending'][prog_name]['max'])
+
+        # If we are updating an existing optimization, then the old name (assigned when
+        # the modal was opened) will match one of the existing entries. Otherwise, it's a new one
+        if old_name:
+            for i in range(0,len(proj.optim_jsons)):
+                if proj.optim_jsons[i]['name'] == old_name:
+                    proj.optim_jsons[i] = json
+                    break
+            else:
+                raise Exception('An existing optimization with name "%s" was not found' % (old_name))
         else:
-            raise Exception('An existing optimization with name "%s" was not found' % (old_name))
-    else:
-        proj.optim_jsons.append(json)
-
-    print('Saving project...')
-    save_project(proj)
+            proj.optim_jsons.append(json)
+        return json
+    json = edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
+    if old_name and old_name != json['name']: # Keep the last optimized allocation with the renamed optimization
+        allocation = load_optimized_allocation(project_id, old_name)
+        if allocation is not None:
+            save_optimized_allocation(project_id, json['name'], allocation)
+            datastore.redis.hdel(optimized_allocation_key(project_id), old_name)
     return json
 
 @RPC()
@@ -2376,31 +4192,30 @@ def delete_optim(project_id, optim_name) -> None:
 
     print('Deleting optimization "%s"...' % (optim_name))
 
-    proj = load_project(project_id, die=True)
-    for i in range(0,len(proj.optim_jsons)):
-        if proj.optim_jsons[i]['name'] == optim_name:
-            del proj.optim_jsons[i]
-            break
-    else:
-        raise Exception('Optimization "%s" not found for deletion' % (optim_name))
-
-    print('Saving project...')
-    save_project(proj)
+    def edit(proj):
+        for i in range(0,len(proj.optim_jsons)):
+            if proj.optim_jsons[i]['name'] == optim_name:
+                del proj.optim_jsons[i]
+                break
+        else:
+            raise Exception('Optimization "%s" not found for deletion' % (optim_name))
+    edit_project(project_id, edit) # Retried if the project is saved by another request in the meantime
+    datastore.redis.hdel(optimized_allocation_key(project_id), optim_name)
     return None
 
 
 # This is the function we should use on occasions when we can't use Celery.
 @RPC()
-def run_optimization(project_id, cache_id, optim_name=None, plot_options=None, maxtime=None, tool=None, plotyear=None, pops=None, dosave=True):
+def run_optimization(project_id, cache_id, optim_name=None, plot_options=None, maxtime=None, tool=None, plotyear=None, pops=None, dosave=True, warm_start=False):
     print('Running Cascade optimization...')
-    sc.printvars(locals(), ['project_id', 'optim_name', 'plot_options', 'maxtime', 'tool', 'plotyear', 'pops', 'dosave'], color='blue')
+    sc.printvars(locals(), ['project_id', 'optim_name', 'plot_options', 'maxtime', 'tool', 'plotyear', 'pops', 'dosave', 'warm_start'], color='blue')
     proj = load_project(project_id, die=True)
 
     # Actually run the optimization and get its results (list of baseline and optimized Result objects).
-    results = proj.run_optimization(optim_name, maxtime=float(maxtime), store_results=False)
-    cache_result(proj, results, cache_id)
+    results = run_json_optimization(proj, optim_name, maxtime=float(maxtime), warm_start=warm_start)
+    cache_result(proj, results, cache_id) # Saves the project
+    save_optimized_allocation(project_id, optim_name, results[1].optim_summary['allocation'])
     output = make_plots(proj, results, tool=tool, year=plotyear, pops=pops, plot_options=plot_options, dosave=dosave, plot_budget=True) # Plot the results.
-    save_project(proj)
     return output
 
 
@@ -2418,7 +4233,12 @@ def cache_result(project=None, result=None, key=None, die=False, verbose=False):
             if die: raise Exception(errormsg)
             else:   print(errormsg)
         project.results[key] = result_key # In most cases, these will match, e.g. project.results['result::4e6efc39-94ef'] = 'result::4e6efc39-94ef'
-        save_project(project)
+        try:
+            save_project(project)
+        except ProjectConflictError: # Adding a result doesn't depend on anything else, so add it to the latest version of the project instead
+            def edit(proj):
+                proj.results[key] = result_key
+            edit_project(project.uid, edit)
     return result_key
 
 
@@ -2445,10 +4265,10 @@ def retrieve_results(proj, verbose=True):
 
 def clear_cached_results(proj, project_id, spare_calibration=False, verbose=True):
     ''' Clear all cached results from the project '''
-    for key,result_key in proj.results.items():
+    for key,result_key in list(proj.results.items()):
         if sc.isstring(result_key):
             if (not spare_calibration) or "calibration" not in result_key:
-                del_result(result_key, project_id)
+                del_result(result_key, project_id, project=proj) # Modify the project in place rather than reloading it for every result
                 if verbose: print('Deleted result "%s" from "%s"' % (key, result_key))
     save_project(proj)
     return proj
@@ -2458,7 +4278,7 @@ def clear_cached_results(proj, project_id, spare_calibration=False, verbose=True
 def plot_results(project_id, cache_id, plot_options, tool=None, plotyear=None, pops=None, dosave=True, plotbudget=False, calibration=False):
     print('Plotting cached results...')
     proj = load_project(project_id, die=True)
-    results = load_result(cache_id) # Load the results from the cache and check if we got a result.
+    results = load_result(cache_id, variables=[]) # Load the results from the cache and check if we got a result. The plotting functions load the variables they need.
     if results is None:
         return { 'error': 'Failed to load plot results from cache' }
     output = make_plots(proj, results, tool=tool, year=plotyear, pops=pops, plot_options=plot_options, dosave=dosave, plot_budget=plotbudget, calibration=calibration)
@@ -3019,7 +4839,7 @@ def default_optim_json(proj: at.Project, tool: str, optim_type:str = 'outcome',
 
     return json
 
-def make_optimization(proj: at.Project, json: dict) -> at.Optimization:
+def make_optimization(proj: at.Project, json: dict, initial: dict = None, scale: dict = None) -> at.Optimization:
     """
     Construct and return an at.Optimization from JSON
 
@@ -3038,6 +4858,8 @@ def make_optimization(proj: at.Project, json: dict) -> at.Optimization:
 
     :param proj: A at.Project instance
     :param json: A FE JSON optimization dict - the type returned by default_optim_json and stored in proj.optim_jsons
+    :param initial: Optionally, a dict of initial spending by program name to use instead of the default (clipped to the limits)
+    :param scale: Optionally, a dict of factors by program name to multiply the initial spending by (clipped to the limits)
     :return: Tuple containing (optimization, initial_instructions, baseline_instructions)
 
     """
@@ -3081,10 +4903,14 @@ def make_optimization(proj: at.Project, json: dict) -> at.Optimization:
             limits[1] = np.inf
 
         # Determine initial value - use the upper limit as the initial spend for money minimization
-        if optim_type == 'money':
+        if initial and prog_name in initial:
+            initial_spend = np.clip(initial[prog_name], limits[0], limits[1])
+        elif optim_type == 'money':
             initial_spend = limits[1]
         else:
             initial_spend = np.clip(default_spend[prog_name], limits[0], limits[1])
+        if scale and prog_name in scale:
+            initial_spend = np.clip(initial_spend*scale[prog_name], limits[0], limits[1])
 
         # Instantiate the adjustable
         adjustments.append(at.SpendingAdjustment(prog_name, t=adjustment_year, limit_type='abs', lower=limits[0], upper=limits[1], initial=initial_spend))
@@ -3139,27 +4965,407 @@ def make_optimization(proj: at.Project, json: dict) -> at.Optimization:
 ###### OPTIMIZATION ####
 ########################
 
-def run_json_optimization(proj: at.Project, optimname: str, maxtime:float =None, maxiters:int =None) -> list:
+class OptimizationObjective(sc.prettyobj):
+    '''
+    The objective function of an optimization, as called by the optimizer
+
+    Each evaluation runs a copy of the model with the allocation applied, as at.optimize()
+    does. The best allocation found so far is kept, along with its objective value and
+    the model it was evaluated with. Callbacks, e.g. an OptimizationCheckpoint, are called
+    with the objective after every evaluation, and can set its stop flag to end the
+    optimization early.
+
+    If there's a tolerance, objective values are memoized on the allocation rounded to a
+    multiple of it, so allocations the optimizer revisits (e.g. at the spending limits)
+    aren't simulated again.
+    '''
+
+    def __init__(self, optimization, pickled_model, hard_constraints, baselines, callbacks=None, tolerance=None):
+        self.optimization = optimization
+        self.pickled_model = pickled_model
+        self.hard_constraints = hard_constraints
+        self.baselines = baselines
+        self.callbacks = callbacks if callbacks else []
+        self.stop = False
+        self.tolerance = tolerance
+        self.memo = {}
+        self.calls = 0 # Evaluations in this run, unlike evaluations, which carries on from a checkpoint
+        self.hits = 0
+        self.evaluations = 0
+        self.best_x = None
+        self.best_objective = np.inf
+        self.best_model = None
+        self.baseline_model = None # The model run with the initial instructions, set by run_optimizer()
+        return None
+
+    def __call__(self, x):
+        self.evaluations += 1
+        self.calls += 1
+        key = tuple(np.round(np.asarray(x, dtype=float)/self.tolerance).astype(np.int64)) if self.tolerance else None
+        if key is not None and key in self.memo:
+            self.hits += 1
+            objective = self.memo[key]
+        else:
+            objective = self.evaluate(x)
+            if key is not None:
+                self.memo[key] = objective
+        for callback in self.callbacks:
+            callback(self)
+        return objective
+
+    def evaluate(self, x):
+        ''' Run the model with an allocation and return its objective value, keeping it if it's the best so far '''
+        model = pickle.loads(self.pickled_model)
+        self.optimization.update_instructions(x, model.program_instructions)
+        try:
+            self.optimization.constrain_instructions(model.program_instructions, self.hard_constraints)
+        except at.FailedConstraint:
+            return np.inf
+        model.process()
+        objective = self.optimization.compute_objective(model, self.baselines)
+        if objective < self.best_objective:
+            self.best_x = np.array(x, dtype=float)
+            self.best_objective = objective
+            self.best_model = model
+        return objective
+
+
+def run_optimizer(proj, optim, parset, progset, instructions, callbacks=None, evaluations=0, tolerance=None):
+    '''
+    Optimize an allocation like at.optimize(), but return the OptimizationObjective, which
+    holds the best allocation, its objective value and its model. ASD is run here, so the
+    objective can be observed; other methods (e.g. PSO for money minimization) are run by
+    at.optimize(), and the allocation it returns is evaluated once more to get its
+    objective value. Callbacks and memoization are only used for ASD. The memoization
+    tolerance defaults to OPTIM_MEMO_TOLERANCE in the config. Like at.optimize(), this
+    raises at.InvalidInitialConditions if the initial allocation can't be evaluated.
+    '''
+    if tolerance is None:
+        tolerance = float(get_setting('OPTIM_MEMO_TOLERANCE', 0))
+    model = at.Model(proj.settings, proj.framework, parset, progset, instructions)
+    pickled_model = pickle.dumps(model)
+    x0, xmin, xmax = optim.get_initialization(progset, model.program_instructions)
+    hard_constraints = optim.get_hard_constraint(progset, model.program_instructions)
+    baseline_model = pickle.loads(pickled_model)
+    baseline_model.process()
+    baselines = [measurable.get_baseline(baseline_model) for measurable in optim.measurables]
+    objective = OptimizationObjective(optim, pickled_model, hard_constraints, baselines, callbacks=callbacks, tolerance=tolerance)
+    objective.evaluations = evaluations # When resuming
+    objective.baseline_model = baseline_model
+    if optim.method == 'asd':
+        if not np.isfinite(objective(x0)): # As checked by at.optimize(); this also means there's always a best model
+            raise at.InvalidInitialConditions('Optimization cannot begin because the objective function was infinite for the specified initialization')
+        sc.asd(objective, x0, xmin=xmin, xmax=xmax, maxtime=optim.maxtime, maxiters=optim.maxiters, stoppingfunc=lambda: objective.stop)
+    else:
+        optimized_instructions = at.optimize(proj, optim, parset, progset, instructions)
+        model = at.Model(proj.settings, proj.framework, parset, progset, optimized_instructions)
+        model.process()
+        objective.best_objective = optim.compute_objective(model, baselines)
+        objective.best_model = model
+    objective.pickled_model = None # Not needed any more, and it's large
+    objective.callbacks = []
+    objective.memo = {}
+    return objective
+
+
+def optimized_allocation(objective, progset, year):
+    ''' Return the spending on each program in a year for the best allocation of an optimization, as a dict '''
+    alloc = progset.get_alloc(tvec=year, instructions=objective.best_model.program_instructions)
+    output = {prog_name:float(val[0]) for prog_name,val in alloc.items()}
+    return output
+
+
+def optimization_checkpoint_key(cache_id):
+    ''' Return the key of the hash holding the checkpoints of the starts of an optimization, e.g. 'optimcheckpoint::<cache_id>' '''
+    return 'optimcheckpoint::' + str(cache_id)
+
+
+def optimization_json_hash(json):
+    ''' Return a hash of an optimization JSON, so that a checkpoint is only resumed by the same optimization '''
+    return hashlib.sha256(pickle.dumps(sc.sanitizejson(json))).hexdigest()
+
+
+def load_optimization_checkpoints(cache_id, json):
+    ''' Return the saved states of the starts of an optimization by start index, skipping any from a different optimization '''
+    jsonhash = optimization_json_hash(json)
+    output = {}
+    for start,raw in datastore.redis.hgetall(optimization_checkpoint_key(cache_id)).items():
+        try:
+            state = decode_blob(raw)
+        except Exception as E:
+            print('Warning: could not load optimization checkpoint %s/%s (%s)' % (cache_id, start.decode(), str(E)))
+            continue
+        if state['jsonhash'] == jsonhash:
+            output[int(start)] = state
+    return output
+
+
+class OptimizationCheckpoint(sc.prettyobj):
+    '''
+    Callback for an OptimizationObjective that saves the state of one start of an
+    optimization to the datastore every OPTIM_CHECKPOINT_INTERVAL seconds and every
+    OPTIM_CHECKPOINT_EVALUATIONS evaluations (either can be 0 to disable it), so that an
+    optimization that's interrupted can be resumed: the best allocation so far, the number
+    of evaluations, the time taken and the state of the random number generator. If the
+    start is being resumed, state is the checkpoint it's resumed from.
+    '''
+
+    def __init__(self, cache_id, start, json, state=None):
+        self.key = optimization_checkpoint_key(cache_id)
+        self.start = start
+        self.jsonhash = optimization_json_hash(json)
+        self.state = state
+        self.interval = float(get_setting('OPTIM_CHECKPOINT_INTERVAL', 60))
+        self.every = int(get_setting('OPTIM_CHECKPOINT_EVALUATIONS', 0))
+        self.elapsed = state['elapsed'] if state else 0.0 # Time taken before this process started on it
+        self.started = None
+        self.saved = None
+        return None
+
+    def __call__(self, objective):
+        now = time.time()
+        if self.started is None:
+            self.started = self.saved = now
+        due = (self.interval and now - self.saved >= self.interval) or (self.every and objective.evaluations % self.every == 0)
+        if due and objective.best_x is not None:
+            self.save(objective)
+        return None
+
+    def save(self, objective):
+        now = time.time()
+        state = {'jsonhash':self.jsonhash, 'x':objective.best_x, 'objective':objective.best_objective, 'evaluations':objective.evaluations,
+                 'elapsed':self.elapsed + now - self.started, 'rng_state':np.random.get_state()}
+        pipe = datastore.redis.pipeline(transaction=True)
+        pipe.hset(self.key, str(self.start), encode_blob(state))
+        pipe.expire(self.key, int(3600*get_setting('GC_TTLS', {}).get('task', 7*24)))
+        pipe.execute()
+        self.saved = now
+        return None
+
+
+def optimization_progress_key(cache_id):
+    ''' Return the key of the hash holding the best allocation so far of each start of an optimization, e.g. 'optimprogress::<cache_id>' '''
+    return 'optimprogress::' + str(cache_id)
+
+
+def optimization_stop_key(cache_id):
+    ''' Return the key that's set to ask an optimization to stop early, e.g. 'optimstop::<cache_id>' '''
+    return 'optimstop::' + str(cache_id)
+
+
+class OptimizationProgress(sc.prettyobj):
+    '''
+    Callback for an OptimizationObjective that publishes every improvement in the best
+    allocation of one start of an optimization to the datastore, for
+    get_optimization_progress(), and stops the optimization if stop_optimization() has
+    been called, which it checks for at most once a second.
+    '''
+
+    def __init__(self, cache_id, start, progset, year):
+        self.key = optimization_progress_key(cache_id)
+        self.stopkey = optimization_stop_key(cache_id)
+        self.start = start
+        self.progset = progset
+        self.year = year
+        self.labels = {prog.name:prog.label for prog in progset.programs.values()}
+        self.published = np.inf
+        self.checked = 0
+        return None
+
+    def __call__(self, objective):
+        if objective.best_objective < self.published:
+            self.publish(objective)
+        now = time.time()
+        if now - self.checked >= 1:
+            self.checked = now
+            if datastore.redis.exists(self.stopkey):
+                print('Stopping optimization start %s early, as requested' % self.start)
+                objective.stop = True
+        return None
+
+    def publish(self, objective):
+        record = {'start':self.start, 'objective':float(objective.best_objective), 'allocation':optimized_allocation(objective, self.progset, self.year),
+                  'labels':self.labels, 'evaluations':objective.evaluations, 'updated':time.time()}
+        pipe = datastore.redis.pipeline(transaction=True)
+        pipe.hset(self.key, str(self.start), encode_blob(record))
+        pipe.expire(self.key, int(3600*get_setting('GC_TTLS', {}).get('task', 7*24)))
+        pipe.execute()
+        self.published = objective.best_objective
+        return None
+
+
+def plot_allocation(allocation, labels=None):
+    ''' Return a bar chart of the spending on each program in an allocation, as an mpld3 dict '''
+    if labels is None: labels = {}
+    names = list(allocation.keys())
+    fig = pl.figure(figsize=(5,3))
+    ax = fig.add_axes([0.35, 0.18, 0.6, 0.72])
+    ax.barh(np.arange(len(names)), [allocation[name] for name in names])
+    ax.set_yticks(np.arange(len(names)))
+    ax.set_yticklabels([labels.get(name, name) for name in names])
+    ax.invert_yaxis() # First program at the top
+    ax.set_xlabel('Spending ($/year)')
+    graph = customize_fig(fig=fig, is_epi=False)
+    return graph
+
+
+@RPC()
+def get_optimization_progress(cache_id, plot=True):
+    '''
+    Return the best allocation found so far by an optimization that's running (or has
+    run) under a cache ID, its objective value and the total number of evaluations over
+    all its starts, and a bar chart of the allocation unless plot is False. Returns None
+    if nothing has been published yet.
+    '''
+    raws = datastore.redis.hgetall(optimization_progress_key(cache_id))
+    records = [decode_blob(raw) for raw in raws.values()]
+    if not records:
+        return None
+    best = min(records, key=lambda record: record['objective'])
+    output = {
+        'objective':   best['objective'],
+        'allocation':  best['allocation'],
+        'start':       best['start'],
+        'evaluations': sum(record['evaluations'] for record in records),
+        'updated':     time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(max(record['updated'] for record in records))),
+    }
+    if plot:
+        output['graph'] = plot_allocation(best['allocation'], best['labels'])
+    return output
+
+
+@RPC()
+def stop_optimization(cache_id):
+    '''
+    Ask an optimization that's running to stop early. It finishes as usual, with the best
+    allocation found so far, so the result is cached and can be plotted as normal.
+    '''
+    datastore.redis.set(optimization_stop_key(cache_id), 1, ex=int(3600*get_setting('GC_TTLS', {}).get('task', 7*24)))
+    return None
+
+
+def get_optimization_pool():
+    '''
+    Return the pool of processes used to run the starts of multi-start optimizations in
+    parallel, or None if OPTIM_PROCESSES in the config module is 0 or 1. See get_process_pool().
+    '''
+    output = get_process_pool('optimizations', int(get_setting('OPTIM_PROCESSES', 1)), initializer=init_worker_process, initargs=(appconfig.__name__,)) # For checkpoints
+    return output
+
+
+def run_optimization_start(projstr, json, scale=None, maxtime=None, maxiters=None, checkpoint=None, progress=None, initial=None, tolerance=None):
+    '''
+    Run one start of an optimization of a pickled project, e.g. in a process of the
+    optimization pool. If there's a checkpoint with a saved state, the start is resumed
+    from it, for whatever time and iterations it had left. The checkpoint and progress
+    callbacks are both optional, the initial allocation is passed to make_optimization(),
+    and the memoization tolerance to run_optimizer().
+    '''
+    proj = pickle.loads(projstr) if isinstance(projstr, bytes) else projstr
+    parset = proj.parset(json['parset_name'])
+    progset = proj.progset(json['progset_name'])
+    evaluations = 0
+    state = checkpoint.state if checkpoint is not None else None
+    if state is not None:
+        print('Resuming optimization start %s after %s evaluations (objective %s)' % (checkpoint.start, state['evaluations'], state['objective']))
+        initial = dict(zip(progset.programs.keys(), state['x'])) # One spending adjustment per program, in order
+        scale = None
+        evaluations = state['evaluations']
+        if maxtime is not None:
+            maxtime = max(maxtime - state['elapsed'], 0.0)
+        if maxiters is not None:
+            maxiters = max(maxiters - evaluations, 1)
+        np.random.set_state(state['rng_state'])
+    optim, baseline_instructions = make_optimization(proj, json, initial=initial, scale=scale)
+    if maxtime is not None:
+        optim.maxtime = maxtime
+    if maxiters is not None:
+        optim.maxiters = maxiters
+    callbacks = [callback for callback in [checkpoint, progress] if callback is not None]
+    objective = run_optimizer(proj, optim, parset, progset, baseline_instructions, callbacks=callbacks, evaluations=evaluations, tolerance=tolerance)
+    return objective
+
+
+def get_optim_json(proj, optimname):
+    ''' Return the optimization JSON with the given name from `proj.optim_jsons` '''
+    for json in proj.optim_jsons:
+        if json['name'] == optimname:
+            return json
+    raise Exception('Could not find any optim json with name "%s"' % (optimname))
+
+
+def optimized_allocation_key(project_key):
+    ''' Return the key of the hash holding the last optimized allocation of each optimization of a project, by name, e.g. 'optimallocation::<uid>' '''
+    return project_aux_key(project_key, 'optimallocation')
+
+
+def save_optimized_allocation(project_id, optimname, allocation):
+    '''
+    Store the allocation from a successful run of an optimization, so that the next run
+    can be warm-started from it. It's stored alongside the project rather than in it, so
+    that storing it doesn't save the project again, and editing the optimization (e.g.
+    with set_optim_info()) doesn't lose it.
+    '''
+    datastore.redis.hset(optimized_allocation_key(project_id), optimname, encode_blob(allocation))
+    return None
+
+
+def load_optimized_allocation(project_id, optimname):
+    ''' Return the allocation stored by save_optimized_allocation() for an optimization, or None if it hasn't got one '''
+    raw = datastore.redis.hget(optimized_allocation_key(project_id), optimname)
+    output = decode_blob(raw) if raw is not None else None
+    return output
+
+
+def run_json_optimization(proj: at.Project, optimname: str, maxtime:float =None, maxiters:int =None, starts:int =None, perturbation:float =0.3, cache_id:str =None, memo_tolerance:float =None, warm_start:bool =False) -> list:
     """
     Run an optimization from a named JSON
 
     This function is used by the FE to run optimizations based on a JSON contained
     within `proj.optim_jsons`.
 
+    With more than one start, the optimization is run several times from different
+    initial allocations, in parallel if there's an optimization pool: the first start
+    uses the initial allocation from `make_optimization` (or the warm start), and each of
+    the others scales the initial spending on each program by a random lognormal factor. The best
+    allocation over all the starts is used. The starts share the time limit: if they can't all
+    run at once, it's divided between the rounds they run in, so the optimization still
+    finishes within `maxtime`.
+
+    The baseline and optimized results are made from the models the optimizer has already
+    run, rather than simulating them again, unless the optimization's end year differs
+    from the project's, in which case they're simulated over the project's years.
+
+    A summary of the optimization is attached to the optimized result as `optim_summary`:
+    the best objective value and allocation, the objective value of each start, and the
+    number of evaluations and the proportion of them answered by memoization.
+
+    If a cache ID is supplied, each start of the optimization is checkpointed under it as
+    it goes, and running the same optimization with the same cache ID again resumes from
+    the checkpoints. They're deleted once the optimization finishes. Each improvement in
+    the best allocation is published under it too, for get_optimization_progress(), and
+    stop_optimization() can be used to finish early.
+
     :param proj: a Project instance
     :param optimname: The name of an optimization (needs to match the 'name' stored in one of `proj.optim_jsons`)
     :param maxtime: Optionally specify maximum run time
     :param maxiters: Optionally specify maximum number of iterations
+    :param starts: Optionally specify the number of starts (default: the 'starts' in the JSON, or OPTIM_STARTS in the config)
+    :param perturbation: Standard deviation of the log of the factors the initial spending is scaled by for the other starts
+    :param cache_id: Optionally specify the key to checkpoint the optimization under, usually the cache ID of its result
+    :param memo_tolerance: Optionally specify the spending tolerance objective values are memoized to (default: OPTIM_MEMO_TOLERANCE in the config; 0 to disable)
+    :param warm_start: If ``True``, start from the allocation of the last successful run of this optimization, if it has one (see save_optimized_allocation())
     :return: Tuple containing (unoptimized_result, optimized_result)
     """
 
-    for json in proj.optim_jsons:
-        if json['name'] == optimname:
-            break
-    else:
-        raise Exception('Could not find any optim json with name "%s"' % (optimname))
-
-    optim, baseline_instructions = make_optimization(proj,json)
+    json = get_optim_json(proj, optimname)
+    initial = load_optimized_allocation(proj.uid, optimname) if warm_start else None # Clipped to the current limits by make_optimization()
+    if initial:
+        print('Warm-starting optimization "%s" from its last optimized allocation' % optimname)
+    if starts is None:
+        starts = int(json.get('starts') or get_setting('OPTIM_STARTS', 1))
+    starts = max(starts, 1)
+    optim, baseline_instructions = make_optimization(proj,json, initial=initial)
     if maxtime is not None:
         optim.maxtime = maxtime
     if maxiters is not None:
@@ -3169,14 +5375,175 @@ def run_json_optimization(proj: at.Project, optimname: str, maxtime:float =None,
     original_end = proj.settings.sim_end
     proj.settings.sim_end = json['end_year']  # Simulation should be run up to the user's end year
     try:
-        optimized_instructions = at.optimize(proj, optim, parset, progset, baseline_instructions)
+        pool = get_optimization_pool()
+        scales = [None] + [{prog_name:np.exp(np.random.normal(0, perturbation)) for prog_name in progset.programs} for start in range(starts-1)]
+        checkpoints = [None]*starts
+        progresses = [None]*starts
+        if cache_id is not None:
+            states = load_optimization_checkpoints(cache_id, json)
+            if not states: # Starting afresh
+                datastore.redis.delete(optimization_progress_key(cache_id))
+            datastore.redis.delete(optimization_stop_key(cache_id))
+            checkpoints = [OptimizationCheckpoint(cache_id, start, json, state=states.get(start)) for start in range(starts)]
+            progresses = [OptimizationProgress(cache_id, start, progset, json['adjustment_year']) for start in range(starts)]
+        processes = int(get_setting('OPTIM_PROCESSES', 1)) if pool is not None else 1
+        rounds = int(np.ceil(starts/processes)) # Number of starts each process runs one after another
+        startmaxtime = optim.maxtime/rounds if optim.maxtime is not None else None
+        startargs = [(scale, startmaxtime, optim.maxiters, checkpoint, progress, initial, memo_tolerance) for scale,checkpoint,progress in zip(scales, checkpoints, progresses)]
+        if starts <= 1 or pool is None:
+            objectives = [run_optimization_start(proj, json, *args) for args in startargs]
+        else:
+            projstr = pickle.dumps(materialize_project(proj), protocol=pickle.HIGHEST_PROTOCOL) # Includes the end year set above
+            objectives = run_in_pool(get_optimization_pool, run_optimization_start, [(projstr, json) + args for args in startargs]) # In the original order, so the first start is the unperturbed one
     except at.InvalidInitialConditions:
         if json['optim_type'] == 'money':
             raise Exception('It was not possible to achieve the optimization target even with an increased budget. Specify or raise upper limits for spending, or decrease the optimization target')
         else:
             raise  # Just raise it as-is
-
-    proj.settings.sim_end = original_end  # Note that if the end year is after the original simulation year, the result won't be visible (although it will have been optimized for)
-    optimized_result = proj.run_sim(parset=parset, progset=progset, progset_instructions=optimized_instructions, result_name="Optimized")
-    unoptimized_result = proj.run_sim(parset=parset, progset=progset, progset_instructions=baseline_instructions, result_name="Baseline")
+    finally:
+        proj.settings.sim_end = original_end  # Note that if the end year is after the original simulation year, the result won't be visible (although it will have been optimized for)
+
+    if cache_id is not None:
+        datastore.redis.delete(optimization_checkpoint_key(cache_id), optimization_stop_key(cache_id))
+    best = int(np.argmin([objective.best_objective for objective in objectives]))
+    if json['end_year'] == original_end: # The optimizer has already run both models over the years the results show
+        optimized_result = at.Result(model=objectives[best].best_model, parset=parset, name="Optimized")
+        unoptimized_result = at.Result(model=objectives[best].baseline_model, parset=parset, name="Baseline")
+    else:
+        optimized_instructions = objectives[best].best_model.program_instructions
+        optimized_result = proj.run_sim(parset=parset, progset=progset, progset_instructions=optimized_instructions, result_name="Optimized")
+        key = simulation_key(proj, parset, progset, baseline_instructions, 'Baseline')
+        unoptimized_result, _ = cached_simulation(key, lambda: proj.run_sim(parset=parset, progset=progset, progset_instructions=baseline_instructions, result_name="Baseline"))
+    optimized_result.optim_summary = {
+        'objective':  float(objectives[best].best_objective),
+        'allocation': optimized_allocation(objectives[best], progset, json['adjustment_year']),
+        'best_start': best,
+        'start_objectives': [float(objective.best_objective) for objective in objectives],
+        'evaluations': sum(objective.evaluations for objective in objectives),
+        'memo_hit_rate': sum(objective.hits for objective in objectives)/max(sum(objective.calls for objective in objectives), 1),
+    }
     return [unoptimized_result, optimized_result]
+
+
+def sweep_budget(proj: at.Project, optimname: str, budget_factors: list, maxtime: float = None, maxiters: int = None) -> dict:
+    """
+    Build an efficiency frontier by running a named optimization JSON at each of a list of
+    budget factors
+
+    The points are optimized in parallel if there's an optimization pool. Each point starts
+    from the allocation of the nearest point that has already finished, scaled to its own
+    budget; the points that are started before any have finished use the default initial
+    allocation. Points are started in order of their distance from a budget factor of 1.
+
+    :param proj: a Project instance
+    :param optimname: The name of an outcome optimization in `proj.optim_jsons`
+    :param budget_factors: The budget factors to optimize at
+    :param maxtime: Optionally specify maximum run time of each point
+    :param maxiters: Optionally specify maximum number of iterations of each point
+    :return: The frontier, a dict with the budget factors, and the total spending, objective value and allocation at each
+    """
+
+    json = get_optim_json(proj, optimname)
+    if json['optim_type'] == 'money':
+        raise Exception('Budget sweeps can only be run for outcome optimizations, not money minimizations')
+    if sc.isstring(budget_factors):
+        budget_factors = budget_factors.split(',') # e.g. '0.5, 1, 2' from the FE
+    factors = [to_float(factor, die=True) for factor in sc.promotetolist(budget_factors)]
+    factors = sorted(set(factor for factor in factors if factor is not None), key=lambda factor: abs(factor-1))
+    if not factors:
+        raise Exception('No budget factors to sweep over were supplied')
+    progset = proj.progset(json['progset_name'])
+    original_end = proj.settings.sim_end
+    proj.settings.sim_end = json['end_year']  # Simulation should be run up to the user's end year
+    try:
+        projstr = pickle.dumps(materialize_project(proj), protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        proj.settings.sim_end = original_end
+
+    points = {} # Budget factor: allocation and objective value, as they finish
+    def start_args(factor):
+        pointjson = sc.dcp(json)
+        pointjson['budget_factor'] = factor
+        initial = None
+        finished = [done for done in points if done > 0]
+        if finished:
+            nearest = min(finished, key=lambda done: abs(done-factor))
+            initial = {prog_name:spend*factor/nearest for prog_name,spend in points[nearest]['allocation'].items()}
+        return (projstr, pointjson, None, maxtime, maxiters, None, None, initial)
+
+    def finish(factor, objective):
+        points[factor] = {'allocation':optimized_allocation(objective, progset, json['adjustment_year']), 'objective':float(objective.best_objective)}
+        print('Optimized budget factor %s: objective %s' % (factor, points[factor]['objective']))
+        return None
+
+    if get_optimization_pool() is None:
+        for factor in factors:
+            finish(factor, run_optimization_start(*start_args(factor)))
+    else:
+        processes = int(get_setting('OPTIM_PROCESSES', 1))
+        pending = list(factors)
+        running = {}
+        retried = False
+        while pending or running:
+            pool = get_optimization_pool()
+            try:
+                while pending and len(running) < processes:
+                    running[pool.submit(run_optimization_start, *start_args(pending[0]))] = pending[0]
+                    pending.pop(0)
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    finish(running[future], future.result())
+                    running.pop(future)
+            except concurrent.futures.process.BrokenProcessPool as E: # As in run_in_pool(), run the unfinished points again once, in a new pool
+                reset_process_pool(pool)
+                if retried:
+                    raise E
+                retried = True
+                print('Warning: a process of the pool died, so running the unfinished points again in a new pool: %s' % str(E))
+                pending = list(running.values()) + pending
+                running = {}
+
+    factors = sorted(points)
+    frontier = {
+        'optim_name':     optimname,
+        'budget_factors': factors,
+        'spending':       [sum(points[factor]['allocation'].values()) for factor in factors],
+        'objectives':     [points[factor]['objective'] for factor in factors],
+        'allocations':    [points[factor]['allocation'] for factor in factors],
+        'labels':         {prog.name:prog.label for prog in progset.programs.values()},
+    }
+    return frontier
+
+
+def plot_frontier(frontier):
+    ''' Return the plot of an efficiency frontier from sweep_budget(), in the same form as make_plots() '''
+    fig = pl.figure(figsize=(5,3))
+    ax = fig.add_axes([0.25, 0.18, 0.70, 0.72])
+    ax.plot(frontier['spending'], frontier['objectives'], 'o-')
+    ax.set_xlabel('Total spending ($/year)')
+    ax.set_ylabel('Objective')
+    ax.set_title(frontier['optim_name'])
+    output = {'graphs':[customize_fig(fig=fig, is_epi=False)], 'legends':[], 'types':['frontier']}
+    return output
+
+
+# This is the function we should use on occasions when we can't use Celery.
+@RPC()
+def run_budget_sweep(project_id, cache_id, optim_name=None, budget_factors=None, maxtime=None):
+    print('Running budget sweep...')
+    sc.printvars(locals(), ['project_id', 'optim_name', 'budget_factors', 'maxtime'], color='blue')
+    proj = load_project(project_id, die=True)
+    frontier = sweep_budget(proj, optim_name, budget_factors, maxtime=float(maxtime) if maxtime else None)
+    cache_result(proj, frontier, cache_id) # Saves the project
+    output = plot_frontier(frontier)
+    return output
+
+
+@RPC()
+def plot_budget_sweep(cache_id):
+    ''' Plot the efficiency frontier of a budget sweep that's been cached, e.g. by the Celery task '''
+    frontier = load_result(cache_id)
+    if frontier is None:
+        return {'error': 'Failed to load budget sweep from cache'}
+    output = plot_frontier(frontier)
+    return output
@@ -0,0 +1,67 @@
+"""
+Tests for the datastore compression codecs. These don't need Redis or the app.
+
+Version: 2026oct18
+"""
+
+import gzip
+import pickle
+from atomica_apps import blobcodecs
+
+data = b'Optima TB '*1000 + bytes(range(256))
+obj = {'name':'test', 'values':[1, 2.5, None], 'nested':{'a':(1,2)}}
+
+
+def test_roundtrip():
+    for codec in blobcodecs.available_codecs():
+        for level in [None, 1]:
+            raw = blobcodecs.compress(data, codec=codec, level=level)
+            assert raw.startswith(blobcodecs.MAGIC + codec.encode() + b':'), 'Missing header for codec "%s"' % codec
+            assert blobcodecs.parse_header(raw)[0] == codec
+            assert blobcodecs.decompress(raw) == data, 'Round trip failed for codec "%s", level %s' % (codec, level)
+            assert blobcodecs.loads(blobcodecs.dumps(obj, codec=codec, level=level)) == obj
+
+
+def test_default_codec():
+    raw = blobcodecs.compress(data)
+    assert blobcodecs.parse_header(raw)[0] == blobcodecs.DEFAULT_CODEC
+    assert blobcodecs.decompress(raw) == data
+
+
+def test_legacy_gzip():
+    ''' Data stored without a header, e.g. by sc.dumpstr(), is assumed to be gzipped '''
+    raw = gzip.compress(pickle.dumps(obj))
+    assert blobcodecs.parse_header(raw) == (None, raw)
+    assert blobcodecs.loads(raw) == obj
+
+
+def test_unknown_codec():
+    for codec in ['bzip2', 'zstd', 'lz4']:
+        if codec in blobcodecs.available_codecs():
+            continue
+        try:
+            blobcodecs.compress(data, codec=codec)
+        except Exception as E:
+            assert codec in str(E)
+        else:
+            raise AssertionError('Compressing with codec "%s" should have failed' % codec)
+
+
+def test_unavailable_on_load():
+    ''' Data stored with a codec that isn't installed here fails with a clear error rather than garbage '''
+    raw = blobcodecs.MAGIC + b'bzip2:' + data
+    try:
+        blobcodecs.decompress(raw)
+    except Exception as E:
+        assert 'bzip2' in str(E)
+    else:
+        raise AssertionError('Decompressing with an unknown codec should have failed')
+
+
+if __name__ == '__main__':
+    test_roundtrip()
+    test_default_codec()
+    test_legacy_gzip()
+    test_unknown_codec()
+    test_unavailable_on_load()
+    print('Done.')
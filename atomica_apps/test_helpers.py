@@ -0,0 +1,188 @@
+"""
+Focused tests for helpers in rpcs.py that don't need Redis or the app. They use the TB
+demo project where they need real Atomica objects. Tests of the RPCs themselves are in
+test_rpcs.py.
+
+Version: 2026oct18
+"""
+
+import os
+import pickle
+import tempfile
+import numpy as np
+import sciris as sc
+import atomica as at
+from atomica_apps import rpcs
+
+demo_result = None # Created by get_result()
+
+def get_result():
+    ''' Return a copy of a result of the TB demo project, which is only simulated once '''
+    global demo_result
+    if demo_result is None:
+        demo_result = at.demo(which='tb', do_run=False).run_sim()
+    return sc.dcp(demo_result)
+
+
+def mark_columnar(result):
+    ''' Mark every array of a Result as stored but not loaded, as load_result(variables=[]) would, without storing anything '''
+    fields = {}
+    for (p,group,i),var in rpcs.result_variables(result):
+        for attr,val in var.__dict__.items():
+            if isinstance(val, np.ndarray) and val.dtype.kind in 'biuf':
+                fields['0/%s/%s/%s/%s' % (p, group, i, attr)] = (p, group, i, attr, val.dtype.str, val.shape)
+    result._columnar = {'key':None, 'fields':fields, 'loaded':set()}
+    return result
+
+
+def field_variable(result, field):
+    ''' Return the model variable a stored field belongs to '''
+    p,group,i = result._columnar['fields'][field][:3]
+    return getattr(result.model.pops[p], group)[i]
+
+
+def test_output_variable_names():
+    assert rpcs.output_variable_names('alive') == {'alive'}
+    assert rpcs.output_variable_names('alive+dead') == {'alive', 'dead'}
+    assert rpcs.output_variable_names('sus:flow') == {'sus', 'flow'}
+    assert rpcs.output_variable_names('1-x_2/y') == {'x_2', 'y'}
+    assert rpcs.output_variable_names({'Total':['inf', 'sus:flow']}) == {'Total', 'inf', 'sus', 'flow'}
+    assert rpcs.output_variable_names([('a', {'b':'c+d'}), 'e']) == {'a', 'b', 'c', 'd', 'e'}
+    assert rpcs.output_variable_names(None) == set()
+
+
+def test_needed_result_fields():
+    result = mark_columnar(get_result())
+    allfields = set(result._columnar['fields'])
+
+    # A compartment needs its own arrays (plus those of any flows into or out of it), but not everything
+    comp = result.model.pops[0].comps[0]
+    fields = rpcs.needed_result_fields(result, {comp.name})
+    own = [field for field in allfields if field_variable(result, field) is comp]
+    assert own and set(own) <= set(fields)
+    assert set(fields) < allfields
+
+    # Fields that are already loaded aren't needed again
+    result._columnar['loaded'].update(fields)
+    assert rpcs.needed_result_fields(result, {comp.name}) == []
+
+    # A variable without arrays of its own needs the arrays of the variables it refers to
+    result = mark_columnar(get_result())
+    allvars = {id(var):var for location,var in rpcs.result_variables(result)}
+    for charac in result.model.pops[0].characs:
+        refs = [ref for val in charac.__dict__.values() for ref in (list(val.values()) if isinstance(val, dict) else (val if isinstance(val, (list, tuple)) else [val])) if id(ref) in allvars]
+        if refs:
+            break
+    else:
+        raise AssertionError('No characteristic of the demo project refers to other variables')
+    for field in [field for field in allfields if field_variable(result, field) is charac]:
+        del result._columnar['fields'][field] # As if it were computed rather than stored
+    fields = rpcs.needed_result_fields(result, {charac.name})
+    needed = set(id(field_variable(result, field)) for field in fields)
+    assert any(id(ref) in needed for ref in refs), 'The variables %s refers to were not loaded' % charac.name
+
+    # Names that aren't variables need nothing
+    assert rpcs.needed_result_fields(result, {'not_a_variable'}) == []
+
+
+def test_restore_framing():
+    ''' Archives are checked before anything is restored, and an incomplete last chunk is skipped '''
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, 'test.dump')
+        with open(filename, 'wb') as f:
+            f.write(b'Not an archive')
+        try:
+            rpcs.admin_restore_db(filename)
+        except Exception as E:
+            assert 'not a database archive' in str(E)
+        else:
+            raise AssertionError('Restoring a file that is not an archive should have failed')
+
+        # An archive that was interrupted partway through its only chunk
+        chunk = rpcs.blobcodecs.compress(pickle.dumps([('key', b'dumped', 0)]))
+        with open(filename, 'wb') as f:
+            f.write(rpcs.DUMP_MAGIC)
+            f.write(len(chunk).to_bytes(8, 'big'))
+            f.write(chunk[:len(chunk)//2])
+        assert rpcs.admin_restore_db(filename, verbose=False).startswith('Restored 0 keys')
+
+        # An archive that was interrupted partway through a chunk header
+        with open(filename, 'wb') as f:
+            f.write(rpcs.DUMP_MAGIC)
+            f.write(b'\x00\x00')
+        assert rpcs.admin_restore_db(filename, verbose=False).startswith('Restored 0 keys')
+
+
+def test_chunked():
+    assert list(rpcs.chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(rpcs.chunked(range(6), 3)) == [[0, 1, 2], [3, 4, 5]]
+    assert list(rpcs.chunked([], 3)) == []
+    assert list(rpcs.chunked(iter('abc'), 10)) == [['a', 'b', 'c']] # Works on iterators, e.g. from scan_keys()
+
+
+def test_splice_result():
+    ''' Splicing the start of a simulation onto the rest of it gives back the whole simulation '''
+    full = get_result()
+    t = full.model.t
+    year = float(t[len(t)//2])
+    n = int(np.sum(t < year - 1e-6))
+    branch = get_result() # As if simulated from the year
+    for location,var in rpcs.result_variables(branch):
+        for attr,val in list(var.__dict__.items()):
+            if isinstance(val, np.ndarray) and val.ndim and val.shape[0] == len(t):
+                var.__dict__[attr] = val[n:]
+    branch.model.t = t[n:]
+    rpcs.splice_result(get_result(), branch, year)
+    assert np.array_equal(branch.model.t, t)
+    for (location,var),(_,fullvar) in zip(rpcs.result_variables(branch), rpcs.result_variables(full)):
+        for attr,val in fullvar.__dict__.items():
+            if isinstance(val, np.ndarray):
+                assert np.array_equal(var.__dict__[attr], val), 'Array %s of %s was not spliced correctly' % (attr, location)
+
+    # Results with different model variables can't be spliced
+    prefix = get_result()
+    prefix.model.pops[0].comps = prefix.model.pops[0].comps[:-1]
+    try:
+        rpcs.splice_result(prefix, get_result(), year)
+    except Exception as E:
+        assert 'same model variables' in str(E)
+    else:
+        raise AssertionError('Splicing results with different variables should have failed')
+
+
+class CountingObjective(rpcs.OptimizationObjective):
+    ''' An objective that records its evaluations instead of running a model '''
+
+    def evaluate(self, x):
+        self.evaluated.append(list(x))
+        return float(np.sum(np.square(x)))
+
+
+def test_objective_memoization():
+    calls = []
+    objective = CountingObjective(None, None, None, None, callbacks=[lambda obj: calls.append(obj.calls)], tolerance=1.0)
+    objective.evaluated = []
+    assert objective([100.0, 200.0]) == 50000.0
+    assert objective([100.0, 200.0]) == 50000.0 # The same allocation
+    assert objective([100.3, 199.8]) == 50000.0 # The same to within the tolerance
+    assert objective([102.0, 200.0]) == 102.0**2 + 200.0**2
+    assert objective.evaluated == [[100.0, 200.0], [102.0, 200.0]]
+    assert objective.calls == objective.evaluations == 4 and objective.hits == 2
+    assert calls == [1, 2, 3, 4], 'Callbacks should be called after every call, including memoized ones'
+
+    # Without a tolerance, every call is evaluated
+    objective = CountingObjective(None, None, None, None, tolerance=0)
+    objective.evaluated = []
+    for i in range(3):
+        objective([100.0, 200.0])
+    assert len(objective.evaluated) == 3 and objective.hits == 0 and not objective.memo
+
+
+if __name__ == '__main__':
+    test_output_variable_names()
+    test_needed_result_fields()
+    test_restore_framing()
+    test_chunked()
+    test_splice_result()
+    test_objective_memoization()
+    print('Done.')
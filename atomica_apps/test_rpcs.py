@@ -9,18 +9,23 @@ Version:
 torun = [
 #'slack',
 #'project_io',
+#'project_versions',
+#'dump_restore',
 #'get_default_programs',
 #'get_cascade_plot',
 #'get_cascade_json',
 'make_plots',
+#'columnar_results',
 #'get_y_factors',
 #'autocalibration',
 #'run_scenarios',
+'branched_scenarios',
 #'optim_io',
 #'run_cascade_optimization',
 #'run_tb_optimization',
 # 'minimize_money',
 #'default_programs',
+#'budget_sweep',
 ]
 
 # Set defaults
@@ -28,6 +33,9 @@ tool = ['tb','cascade'][0] # Change this to change between TB and Cascade
 default_which = {'tb':'tb', 'cascade':'hypertension'}[tool]
 
 # Imports
+import os
+import tempfile
+import numpy as np
 import sciris as sc
 import scirisweb as sw
 import atomica as at
@@ -86,6 +94,68 @@ if 'project_io' in torun:
     print(P)
 
 
+if 'project_versions' in torun:
+    heading('Running project_versions', 'big')
+
+    # A project that's been saved since it was loaded can't be saved again
+    P1 = rpcs.load_project(proj_id)
+    P2 = rpcs.load_project(proj_id)
+    P1.name = 'Saved first'
+    rpcs.save_project(P1)
+    P2.name = 'Saved second'
+    try:
+        rpcs.save_project(P2)
+    except rpcs.ProjectConflictError as E:
+        print('Conflict detected as expected: %s' % str(E))
+    else:
+        raise Exception('Saving an out-of-date project should have raised a ProjectConflictError')
+    assert rpcs.load_project(proj_id).name == 'Saved first'
+    rpcs.save_project(P1) # The project that was saved can be saved again
+
+    # edit_project() applies the edit again if another request saves the project in between
+    attempts = []
+    def edit(P):
+        attempts.append(P.name)
+        if len(attempts) == 1: # Simulate another request saving the project while this one is editing it
+            other = rpcs.load_project(proj_id)
+            other.name = 'Renamed by another request'
+            rpcs.save_project(other)
+        P.optim_jsons = []
+        return len(attempts)
+    output = rpcs.edit_project(proj_id, edit)
+    P = rpcs.load_project(proj_id)
+    assert output == 2 and P.name == 'Renamed by another request' and P.optim_jsons == [], 'The edit was not retried on the latest version'
+    print('Edit applied after %s attempts' % output)
+
+
+if 'dump_restore' in torun:
+    heading('Running dump_restore', 'big')
+    pattern = '*%s*' % proj_id
+    keys = sorted(rpcs.scan_keys(pattern))
+    values = {key:datastore.redis.dump(key) for key in keys}
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, 'test.dump')
+        print(rpcs.admin_dump_db(filename, pattern=pattern, chunksize=2))
+
+        # Keys that were deleted are restored, and existing ones are skipped
+        datastore.redis.delete(keys[0])
+        output = rpcs.admin_restore_db(filename)
+        assert output.startswith('Restored 1 keys') and 'skipped %s' % (len(keys)-1) in output
+        assert all(datastore.redis.dump(key) == values[key] for key in keys)
+
+        # An interrupted dump restores its complete chunks
+        with open(filename, 'rb+') as f:
+            f.truncate(os.path.getsize(filename)-10)
+        datastore.redis.delete(*keys)
+        output = rpcs.admin_restore_db(filename)
+        restored = [key for key in keys if datastore.redis.exists(key)]
+        print('Restored %s of %s keys from the truncated dump' % (len(restored), len(keys)))
+        assert 0 < len(restored) < len(keys) or len(keys) <= 2
+        for key in keys: # Put back anything the truncated dump didn't have
+            if not datastore.redis.exists(key):
+                datastore.redis.restore(key, 0, values[key])
+
+
 if 'get_default_programs' in torun:
     heading('Running get_default_programs', 'big')
     output = rpcs.get_default_programs()
@@ -143,6 +213,24 @@ if 'make_plots' in torun:
         sw.browser(output['graphs']+output['legends'])
 
 
+if 'columnar_results' in torun:
+    heading('Running columnar_results', 'big')
+    variables = ['alive']
+    result = proj.run_sim()
+    key = rpcs.save_result(result)
+    partial = rpcs.load_result(key, variables=variables)
+    print('Loaded %s of %s arrays for %s' % (len(partial._columnar['loaded']), len(partial._columnar['fields']), variables))
+    assert 0 < len(partial._columnar['loaded']) < len(partial._columnar['fields'])
+    assert np.allclose(partial.get_variable('alive')[0].vals, result.get_variable('alive')[0].vals)
+    rpcs.load_result_variables(partial)
+    assert not hasattr(partial, '_columnar'), 'The result should be complete once every variable is loaded'
+    for (location,var),(_,fullvar) in zip(rpcs.result_variables(partial), rpcs.result_variables(result)):
+        for attr,val in fullvar.__dict__.items():
+            if isinstance(val, np.ndarray):
+                assert np.array_equal(var.__dict__[attr], val), 'Array %s of %s differs' % (attr, location)
+    output = rpcs.make_plots(proj, results=rpcs.load_result(key, variables=variables), calibration=True)
+
+
 if 'get_y_factors' in torun:
     output = rpcs.get_y_factors(proj_id)
 
@@ -167,6 +255,30 @@ if 'run_scenarios' in torun:
         sw.browser(output['graphs']+output['legends'])
 
 
+if 'branched_scenarios' in torun:
+    heading('Running branched_scenarios', 'big')
+    P = rpcs.load_project(proj_id)
+    P.demo_scenarios(dorun=False)
+    scens = [scen for scen in P.scens.values() if scen.active]
+    year = rpcs.scenario_branch_year(P, scens)
+    if year is None:
+        print('Warning: the demo scenarios do not share a simulation, so they cannot be branched')
+    else:
+        branched = rpcs.run_branched_scenarios(P, scens, year)
+        full = P.run_scenarios(store_results=False)
+        for b,f in zip(branched, full):
+            assert np.array_equal(b.model.t, f.model.t)
+            for (location,bvar),(_,fvar) in zip(rpcs.result_variables(b), rpcs.result_variables(f)): # Every compartment, characteristic, parameter and flow, over all years, so including those from the branch year on
+                for attr,val in fvar.__dict__.items():
+                    if isinstance(val, np.ndarray) and val.dtype.kind in 'biuf':
+                        bval = bvar.__dict__[attr]
+                        assert bval.shape == val.shape and np.allclose(bval, val, rtol=1e-6, equal_nan=True), 'Array %s of %s in scenario "%s" differs when branched at %s' % (attr, location, f.name, year)
+            if f.model.progset is not None: # Budget scenarios
+                for prog_name,spending in f.get_alloc().items():
+                    assert np.allclose(b.get_alloc()[prog_name], spending, rtol=1e-6), 'Spending on %s in scenario "%s" differs when branched at %s' % (prog_name, f.name, year)
+        print('%s scenarios branched at %s match the full simulations' % (len(scens), year))
+
+
 if 'optim_io' in torun:
     heading('Running optim_io', 'big')
     dorun = True
@@ -210,6 +322,22 @@ if 'minimize_money' in torun and tool=='tb':
     results = proj.demo_optimization(dorun=True,tool=tool,optim_type='money')
 
 
+if 'budget_sweep' in torun:
+    heading('Running budget_sweep', 'big')
+    browser = False
+    maxtime = 2
+    json = rpcs.get_default_optim(proj_id, tool=tool, optim_type='outcome')
+    rpcs.update_optim(proj_id, json)
+    frontier = rpcs.sweep_budget(rpcs.load_project(proj_id), json['name'], [0.5, 1.0], maxtime=maxtime)
+    rpcs.cache_result(rpcs.load_project(proj_id), frontier, cache_id)
+    assert rpcs.load_result(cache_id) == frontier, 'The cached frontier does not match the one that was saved'
+    output = rpcs.plot_budget_sweep(cache_id)
+    assert 'error' not in output and len(output['graphs']) == 1
+    sc.pp(frontier)
+    if browser:
+        sw.browser(output['graphs'])
+
+
 if 'default_programs' in torun:
     progyears = [2015,2017]
     active_progs = rpcs.get_default_programs()
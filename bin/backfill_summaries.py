@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+'''
+Write the project summary records used by the project list for every project that
+doesn't have one yet. Only needs to be run once on databases created before summaries
+were introduced -- projects saved since then get a summary automatically.
+
+Usage:
+    python backfill_summaries.py which=tb [overwrite=1]
+
+Version: 2026oct18
+'''
+
+import sys
+import atomica_apps
+
+# Process arguments
+kwargs = {'which':'tb', 'overwrite':''}
+for i,arg in enumerate(sys.argv[1:]):
+    try:
+        k = arg.split("=")[0]
+        v = arg.split("=")[1]
+        kwargs[k] = v
+        print('Including kwarg: "%s" = %s' % (k,v))
+    except Exception as E:
+        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+        raise Exception(errormsg)
+
+config = {'tb':atomica_apps.config_tb, 'cascade':atomica_apps.config_cascade}[kwargs['which']]
+atomica_apps.rpcs.find_datastore(config=config)
+atomica_apps.rpcs.admin_backfill_summaries(overwrite=bool(kwargs['overwrite']))
@@ -0,0 +1,9 @@
+#!/usr/bin/env python
+
+# Imports
+import atomica_apps.apptasks_cascade as at
+
+if __name__ == '__main__':
+    # Run the Celery scheduler for periodic tasks, i.e. garbage collection. Only run one of
+    # these, however many workers there are, or the tasks will be run more than once.
+    at.celery_instance.Beat(loglevel='info').run()
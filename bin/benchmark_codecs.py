@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+'''
+Compare the datastore compression codecs on the TB demo project and its results:
+stored size, and time taken to encode (pickle + compress) and decode (decompress +
+unpickle). Codecs whose packages aren't installed are skipped. Use the output to
+choose BLOB_CODEC and BLOB_CODEC_LEVEL in the config modules.
+
+Usage:
+    python benchmark_codecs.py [repeats=5]
+
+Version: 2026oct18
+'''
+
+import sys
+import time
+import pickle
+import atomica as at
+from atomica_apps import blobcodecs
+
+# Process arguments
+kwargs = {'repeats':'5'}
+for i,arg in enumerate(sys.argv[1:]):
+    try:
+        k = arg.split("=")[0]
+        v = arg.split("=")[1]
+        kwargs[k] = v
+        print('Including kwarg: "%s" = %s' % (k,v))
+    except Exception as E:
+        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+        raise Exception(errormsg)
+repeats = int(kwargs['repeats'])
+
+# Codecs and levels to compare
+levels = {
+    'none': [None],
+    'gzip': [1, 6, 9],
+    'zstd': [1, 3, 9, 19],
+    'lz4':  [0, 9],
+}
+
+def timeit(func, *args):
+    ''' Return the output of the function and the best time over the repeats, in ms '''
+    best = None
+    for r in range(repeats):
+        start = time.perf_counter()
+        output = func(*args)
+        elapsed = 1000*(time.perf_counter() - start)
+        best = elapsed if best is None else min(best, elapsed)
+    return output, best
+
+# Create the objects
+print('Creating TB demo project...')
+proj = at.demo(which='tb', do_run=False)
+result = proj.run_sim()
+objs = {'project':proj, 'result':result}
+
+# Run the benchmark
+skipped = [codec for codec in levels if codec not in blobcodecs.available_codecs()]
+if skipped:
+    print('Skipping codecs that are not installed: %s' % ', '.join(skipped))
+header = '%-8s %-6s %-6s %12s %8s %12s %12s' % ('Object', 'Codec', 'Level', 'Size (kB)', 'Ratio', 'Encode (ms)', 'Decode (ms)')
+print(header)
+print('-'*len(header))
+for objname,obj in objs.items():
+    rawsize = len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+    for codec,codeclevels in levels.items():
+        if codec in skipped:
+            continue
+        for level in codeclevels:
+            raw, encodetime = timeit(blobcodecs.dumps, obj, codec, level)
+            _, decodetime = timeit(blobcodecs.loads, raw)
+            print('%-8s %-6s %-6s %12.1f %8.2f %12.1f %12.1f' % (objname, codec, level, len(raw)/1e3, rawsize/len(raw), encodetime, decodetime))
+    print('')
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+'''
+Delete results, figures and task records that nothing refers to any more, once they
+haven't been used for the hours set in GC_TTLS in the config file. By default this is
+a dry run that only lists the keys that would be deleted; pass dryrun=0 to delete them.
+The Celery worker also does this periodically (see GC_INTERVAL).
+
+Usage:
+    python collect_garbage.py which=tb [dryrun=0] [batchsize=1000]
+
+Version: 2026oct18
+'''
+
+import sys
+import atomica_apps
+
+# Process arguments
+kwargs = {'which':'tb', 'dryrun':'1', 'batchsize':'1000'}
+for i,arg in enumerate(sys.argv[1:]):
+    try:
+        k = arg.split("=")[0]
+        v = arg.split("=")[1]
+        kwargs[k] = v
+        print('Including kwarg: "%s" = %s' % (k,v))
+    except Exception as E:
+        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+        raise Exception(errormsg)
+
+config = {'tb':atomica_apps.config_tb, 'cascade':atomica_apps.config_cascade}[kwargs['which']]
+atomica_apps.rpcs.find_datastore(config=config)
+atomica_apps.rpcs.admin_collect_garbage(dryrun=kwargs['dryrun'] not in ['0', ''], batchsize=int(kwargs['batchsize']))
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+'''
+Dump the database to a compressed archive file, a chunk of keys at a time, without
+loading the whole database into memory. Restore it with restoredb.py.
+
+Usage:
+    python dumpdb.py which=tb [filename=db.dump] [pattern=*] [chunksize=1000]
+
+Version: 2026oct18
+'''
+
+import sys
+import atomica_apps
+
+# Process arguments
+kwargs = {'which':'tb', 'filename':None, 'pattern':'*', 'chunksize':'1000'}
+for i,arg in enumerate(sys.argv[1:]):
+    try:
+        k = arg.split("=")[0]
+        v = arg.split("=")[1]
+        kwargs[k] = v
+        print('Including kwarg: "%s" = %s' % (k,v))
+    except Exception as E:
+        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+        raise Exception(errormsg)
+
+config = {'tb':atomica_apps.config_tb, 'cascade':atomica_apps.config_cascade}[kwargs['which']]
+atomica_apps.rpcs.find_datastore(config=config)
+output = atomica_apps.rpcs.admin_dump_db(filename=kwargs['filename'], pattern=kwargs['pattern'], chunksize=int(kwargs['chunksize']))
+print(output)
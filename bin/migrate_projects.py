@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+'''
+Migrate every stored project to the installed version of Atomica, in parallel, and save
+back the ones whose results don't change. Run it after upgrading Atomica and before
+restarting the app, so that users don't wait for migration on their next load. Projects
+whose results would change need an updated copy to be made by the user; they're listed
+in the report.
+
+Usage:
+    python migrate_projects.py which=tb [processes=4] [dryrun=1] [report=migration_report.csv]
+
+Version: 2026oct18
+'''
+
+import sys
+import atomica_apps
+
+# Process arguments
+kwargs = {'which':'tb', 'processes':None, 'dryrun':'', 'report':'migration_report.csv'}
+for i,arg in enumerate(sys.argv[1:]):
+    try:
+        k = arg.split("=")[0]
+        v = arg.split("=")[1]
+        kwargs[k] = v
+        print('Including kwarg: "%s" = %s' % (k,v))
+    except Exception as E:
+        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+        raise Exception(errormsg)
+
+if __name__ == '__main__': # Required for the process pool
+    config = {'tb':atomica_apps.config_tb, 'cascade':atomica_apps.config_cascade}[kwargs['which']]
+    processes = int(kwargs['processes']) if kwargs['processes'] else None
+    atomica_apps.rpcs.find_datastore(config=config)
+    atomica_apps.rpcs.admin_migrate_projects(processes=processes, dryrun=bool(kwargs['dryrun']), reportfile=kwargs['report'])
+    print('Report written to %s' % kwargs['report'])
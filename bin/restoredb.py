@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+'''
+Restore a database archive written by dumpdb.py. Keys that already exist are skipped,
+unless replace=1 is passed, in which case they're overwritten.
+
+Usage:
+    python restoredb.py which=tb filename=db.dump [replace=1]
+
+Version: 2026oct18
+'''
+
+import sys
+import atomica_apps
+
+try:    inputfunc = raw_input
+except: inputfunc = input
+
+# Process arguments
+kwargs = {'which':'tb', 'filename':None, 'replace':''}
+for i,arg in enumerate(sys.argv[1:]):
+    try:
+        k = arg.split("=")[0]
+        v = arg.split("=")[1]
+        kwargs[k] = v
+        print('Including kwarg: "%s" = %s' % (k,v))
+    except Exception as E:
+        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+        raise Exception(errormsg)
+if not kwargs['filename']:
+    raise Exception('Please specify the archive to restore, e.g. filename=db.dump')
+
+config = {'tb':atomica_apps.config_tb, 'cascade':atomica_apps.config_cascade}[kwargs['which']]
+replace = bool(kwargs['replace'])
+if replace:
+    prompt = 'Are you sure you want to overwrite existing keys in the following?\n  %s\nAnswer (y/[n]): ' % config.REDIS_URL
+    if inputfunc(prompt) != 'y':
+        print('Database not restored.')
+        sys.exit()
+atomica_apps.rpcs.find_datastore(config=config)
+atomica_apps.rpcs.admin_restore_db(filename=kwargs['filename'], replace=replace)
@@ -2,24 +2,24 @@
 
 import sys
 
+if __name__ == '__main__': # The scenario and optimization process pools import this script in every process they start
+    print('')
+    print('#########################################')
+    print('Starting the Cascade server...')
+    print('#########################################')
 
-print('')
-print('#########################################')
-print('Starting the Cascade server...')
-print('#########################################')
+    # Process arguments
+    kwargs = {}
+    for i,arg in enumerate(sys.argv[1:]):
+        try:
+            k = arg.split("=")[0]
+            v = arg.split("=")[1]
+            kwargs[k] = v
+            print('Including kwarg: "%s" = %s' % (k,v))
+        except Exception as E:
+            errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
+            raise Exception(errormsg)
 
-# Process arguments
-kwargs = {}
-for i,arg in enumerate(sys.argv[1:]):
-    try:
-        k = arg.split("=")[0]
-        v = arg.split("=")[1]
-        kwargs[k] = v
-        print('Including kwarg: "%s" = %s' % (k,v))
-    except Exception as E:
-        errormsg = 'Failed to parse argument key="%s", value="%s": %s' % (k, v, str(E))
-        raise Exception(errormsg)
-
-# Run the server
-import atomica_apps
-atomica_apps.main.run(which='cascade', **kwargs)
+    # Run the server
+    import atomica_apps
+    atomica_apps.main.run(which='cascade', **kwargs)
@@ -4,9 +4,10 @@
 import sys
 import atomica_apps.apptasks_cascade as at
 
-# If running on Windows, use eventlets
-if 'win' in sys.platform: args = [__file__, '-l', 'info', '-P', 'eventlet']
-else:                     args = [__file__, '-l', 'info']
+if __name__ == '__main__': # The optimization process pools import this script in every process they start
+    # If running on Windows, use eventlets
+    if 'win' in sys.platform: args = [__file__, '-l', 'info', '-P', 'eventlet']
+    else:                     args = [__file__, '-l', 'info']
 
-# Run Celery
-at.celery_instance.worker_main(args)
+    # Run Celery
+    at.celery_instance.worker_main(args)
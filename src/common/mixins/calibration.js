@@ -329,7 +329,7 @@ var CalibrationMixin = {
         })
       },
 
-      autoCalibrate(project_id) {
+      async autoCalibrate(project_id) {
         console.log('autoCalibrate() called')
         this.validateYears()  // Make sure the start end years are in the right range.
         this.$sciris.start(this)
@@ -338,30 +338,43 @@ var CalibrationMixin = {
         } else {
           var maxtime = 9999
         }
-        this.$sciris.rpc('automatic_calibration', [
-          project_id, 
-          this.serverDatastoreId
-        ], {
-          'parsetname': this.activeParset, 
-          'max_time': maxtime, 
-          'plot_options': this.plotOptions,
-          'plotyear': this.simEndYear, 
-          'pops': this.activePop, 
-          'tool': this.toolName(), 
-        }) // Go to the server to get the results from the package set.
-        .then(response => {
-          this.table = response.data.table
-          this.makeGraphs(response.data)
-          this.updateSets() // Update the project summaries so the deleted parset shows up on the list.
-          .then(response2 => {
-            this.loadParTable() // Reload the parameters.
-            this.$sciris.succeed(this, 'Simulation run, graphs now rendering...') // Indicate success.
-          })
-        })
-        .catch(error => {
+        let taskId = this.serverDatastoreId // The task caches its result under the same ID
+        try {
+          await this.$sciris.rpc('delete_task', [taskId]) // Clear the task record of the last calibration, if there is one
+        } catch (error) {
+          console.log('No previous calibration task to delete')
+        }
+        try {
+          let response = await this.$sciris.rpc('launch_task', [
+            taskId,
+            'run_' + this.toolName() + '_calibration',
+            [project_id, taskId],
+            {'parsetname': this.activeParset, 'max_time': maxtime}
+          ]) // Run the calibration on a worker, rather than in the web server
+          if (response.data.error) {
+            throw new Error(response.data.error)
+          }
+          let status = 'queued'
+          while ((status === 'queued') || (status === 'started')) { // Poll the task until it finishes
+            await this.$sciris.sleep(1000)
+            let result = await this.$sciris.rpc('check_task', [taskId])
+            status = result.data.task.status
+            if (status === 'error') {
+              throw new Error(result.data.task.errorMsg)
+            }
+            let progress = await this.$sciris.rpc('get_task_progress', [taskId])
+            if (progress.data && (progress.data.evaluations !== undefined)) {
+              console.log('Calibration: ' + progress.data.evaluations + ' evaluations after ' + Math.round(progress.data.elapsed) + ' s')
+            }
+          }
+          await this.$sciris.rpc('delete_task', [taskId])
+          await this.updateSets() // Update the project summaries so the calibrated parset shows up on the list.
+          await this.loadParTable() // Reload the parameters.
+          this.reloadGraphs(true) // Plot the cached result, and indicate success
+        } catch (error) {
           console.log(error.message)
           this.$sciris.fail(this, 'Could not run automatic calibration', error)
-        })
+        }
       },
 
       reconcile() {